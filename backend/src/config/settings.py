@@ -28,6 +28,8 @@ class Settings(BaseSettings):
     BE_OUTPUT_DIR: str = "data/be_output"
     LOGS_DIR: str = "logs"
     PIPELINE_MODE: str = os.getenv("PIPELINE_MODE", "demo")
+    NORMALIZE_PARALLEL_MIN_MB: int = 64  # Text files from this size on are normalized in parallel chunks
+    NORMALIZE_WORKERS: int = 0  # Worker processes for parallel normalization (0 = one per CPU)
 
     # Database Configuration
     DATABASE_URL: str = "sqlite:///pipeline.db"
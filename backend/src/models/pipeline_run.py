@@ -3,7 +3,8 @@ SQLAlchemy model for tracking pipeline runs and their statuses.
 """
 from datetime import datetime, timezone
 import uuid
-from sqlalchemy import Column, String, DateTime, Integer, create_engine, Text, Float, Index
+from sqlalchemy import Column, String, DateTime, Integer, create_engine, Text, Index, and_, case, func
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import json
@@ -36,7 +37,7 @@ class PipelineRun(Base):
         gemini_total_tokens: Total number of tokens for Gemini
         ai_model: Name of the AI model used for processing
         invalid_lines: Number of invalid lines
-        estimated_cost: Estimated cost of the run
+        estimated_cost: Estimated cost of the run, derived from the Gemini token counts (not stored; None without them)
         invalid_line_numbers: JSON string of invalid line numbers
         priority: Priority of the run (1-5) default is 3
     """
@@ -61,13 +62,15 @@ class PipelineRun(Base):
     gemini_output_tokens = Column(Integer, nullable=True)
     gemini_total_tokens = Column(Integer, nullable=True)
     ai_model = Column(String, nullable=False, default='Gemini 2.5 Flash')
-    estimated_cost = Column(Float, nullable=True)
     gemini_header_mapping = Column(Text, nullable=True)
     gemini_sample_rows = Column(Text, nullable=True)
     error_message = Column(String, nullable=True)
     file_encoding = Column(String, nullable=True)
     stage_stats = Column(Text, nullable=True)
     priority = Column(Integer, nullable=False, default=3)
+    # Parsed stage_stats the orchestrator updates between commits, and how many of its stages are OK/SKIPPED; not columns
+    _stage_stats_cache = None
+    _stages_ok = 0
 
     # Indexes for optimization
     __table_args__ = (
@@ -76,6 +79,30 @@ class PipelineRun(Base):
         Index('idx_status_lookup', 'status'),
     )
 
+    # Gemini pricing in USD per million tokens
+    INPUT_TOKEN_COST = 0.30
+    OUTPUT_TOKEN_COST = 2.50
+
+    @hybrid_property
+    def estimated_cost(self):
+        # No cost for runs that never queried Gemini (automatic mapping, early failure)
+        if self.gemini_input_tokens is None and self.gemini_output_tokens is None:
+            return None
+        return (
+            (self.gemini_input_tokens or 0) * self.INPUT_TOKEN_COST / 1_000_000 +
+            (self.gemini_output_tokens or 0) * self.OUTPUT_TOKEN_COST / 1_000_000
+        )
+
+    @estimated_cost.expression
+    def estimated_cost(cls):
+        return case(
+            (and_(cls.gemini_input_tokens.is_(None), cls.gemini_output_tokens.is_(None)), None),
+            else_=(
+                func.coalesce(cls.gemini_input_tokens, 0) * cls.INPUT_TOKEN_COST / 1_000_000 +
+                func.coalesce(cls.gemini_output_tokens, 0) * cls.OUTPUT_TOKEN_COST / 1_000_000
+            ),
+        )
+
     def to_dict(self):
         """Convert the model to a dictionary for API responses."""
         def iso_utc(dt):
@@ -126,15 +153,18 @@ class PipelineRun(Base):
         return result
 
 # Database setup function
-def init_db(db_url='sqlite:///pipeline.db'):
-    """Initialize the database and create tables."""
+def init_db(db_url='sqlite:///pipeline.db', busy_timeout: float = 5.0):
+    """
+    Initialize the database and create tables.
+    busy_timeout is how many seconds a SQLite connection waits for another writer's lock before failing.
+    """
     engine = create_engine(
         db_url,
-        connect_args={"check_same_thread": False}, # Required for SQLite
-        pool_size=20,  # Increase pool size
-        max_overflow=30,  # Increase max overflow
+        connect_args={"check_same_thread": False, "timeout": busy_timeout}, # Required for SQLite
+        pool_size=10,  # Each file now holds one connection for a few checkpoint commits
+        max_overflow=20,
         pool_timeout=60,  # Increase timeout
-        pool_recycle=3600,  # Recycle connections every hour
+        pool_recycle=1800,  # Recycle connections every 30 minutes
         pool_pre_ping=True  # Validate connections before use
     )
     Base.metadata.create_all(engine)
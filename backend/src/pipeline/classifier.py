@@ -352,7 +352,8 @@ def classify_file(file_path: str | Path) -> dict:
                 'normalize_flags': normalize_flags,
                 'known_columns_count': known_columns_count,
                 'total_columns_count': total_columns_count,
-                'separators_list': separators_list
+                'separators_list': separators_list,
+                'dataframe': df,  # Reused by the sampler instead of reading the workbook again
             }
         except Exception as e:
             error_msg = f"Failed to read and validate Excel file content: {e}"
@@ -2,14 +2,20 @@
 CSV Normalizer module for validating and transforming CSV data.
 """
 import csv
+import io
+import multiprocessing
+import os
 import re
+import shutil
+import tempfile
 from pathlib import Path
 from typing import List, Dict, Tuple, Any
+from collections import Counter
 import logging
 from datetime import datetime
 from email_validator import validate_email, EmailNotValidError
 from ..config.settings import settings
-import json
+import orjson
 from pathlib import Path
 from .tabular_utils import read_excel_file
 import py7zr
@@ -18,8 +24,111 @@ logger = logging.getLogger(__name__)
 
 # Load known_headers.json at module level
 known_headers_path = Path(__file__).parent / "known_headers.json"
-with open(known_headers_path, "r", encoding="utf-8") as f:
-    known_headers = json.load(f)
+with open(known_headers_path, "rb") as f:
+    known_headers = orjson.loads(f.read())
+known_header_keys = frozenset(known_headers)
+
+# Delimiters used to split an unquoted trailing field; the regex matches either a quote
+# or any delimiter so the splitter only visits the characters it cares about.
+FALLBACK_DELIMITERS = [',', ';', '|', '\t', ':']
+_FALLBACK_SPLIT_RE = re.compile('["' + ''.join(re.escape(d) for d in FALLBACK_DELIMITERS) + ']')
+
+# Column name quoted in the reasons returned by _verify_row
+_COLUMN_REASON_RE = re.compile(r"column '([^']+)'")
+
+# Phone numbers: optional leading '+', then digits, spaces, dashes and parentheses
+_PHONE_RE = re.compile(r'^\+?[\d\s\-()]+$')
+# Everything a phone number loses when normalized (keeps digits and '+')
+_PHONE_STRIP_RE = re.compile(r'[^\d+]')
+
+# Write buffer of the output files; rows are small, so the default 8 KiB means a write() every few rows
+OUTPUT_WRITE_BUFFER = 1 << 20
+
+# Substring lengths sampled by the repetitive pattern analysis
+PATTERN_SHINGLE_LENGTHS = (3, 4, 5, 8, 13)
+
+
+def split_unquoted_fields(field: str, delimiters: List[str] = FALLBACK_DELIMITERS) -> List[str]:
+    """
+    Recursively split a field on single-character delimiters, skipping quoted regions.
+    Each piece is split at the first unquoted occurrence of the highest-priority delimiter it
+    contains, both halves are stripped and split again; a piece that is quoted as a whole is kept.
+    """
+    if delimiters is FALLBACK_DELIMITERS:
+        splitter = _FALLBACK_SPLIT_RE
+    else:
+        splitter = re.compile('["' + ''.join(re.escape(d) for d in delimiters) + ']')
+    fields = []
+    pending = [field]
+    while pending:
+        current = pending.pop()
+        if len(current) >= 2 and current.startswith('"') and current.endswith('"'):
+            fields.append(current)
+            continue
+        # One scan records the first unquoted position of every delimiter
+        first = {}
+        in_quotes = False
+        for match in splitter.finditer(current):
+            char = match.group()
+            if char == '"':
+                in_quotes = not in_quotes
+            elif not in_quotes and char not in first:
+                first[char] = match.start()
+        pos = next((first[d] for d in delimiters if d in first), None)
+        if pos is None:
+            fields.append(current)
+            continue
+        pending.append(current[pos + 1:].strip())
+        pending.append(current[:pos].strip())
+    return fields
+
+
+class _ByteRangeReader(io.RawIOBase):
+    """Raw reader over bytes [start, end) of a file, so a chunk can be decoded with the regular text I/O stack."""
+
+    def __init__(self, path: str, start: int, end: int):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:self._remaining]
+        n = self._file.readinto(view)
+        self._remaining -= n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _normalize_text_chunk(task: dict) -> dict:
+    """
+    Worker entry point for Normalizer._normalize_text_parallel: normalizes one byte range of a text file
+    into temporary output files and returns their paths with the chunk-local counters.
+    """
+    norm = task['normalizer']
+    index = task['index']
+    parts = {part: str(Path(task['tmp_dir']) / f"{index}.{part}") for part in ('output', 'be_output', 'invalid', 'reprocess')}
+    raw = _ByteRangeReader(task['input_path'], task['start'], task['end'])
+    with io.TextIOWrapper(io.BufferedReader(raw, 1 << 20), encoding=task['encoding'] or 'utf-8', errors='replace') as infile, \
+         open(parts['output'], 'w', encoding='utf-8', newline='', buffering=OUTPUT_WRITE_BUFFER) as outfile, \
+         open(parts['invalid'], 'w', encoding='utf-8', buffering=OUTPUT_WRITE_BUFFER) as invalid_file, \
+         open(parts['be_output'], 'wb', buffering=OUTPUT_WRITE_BUFFER) as be_output_file, \
+         open(parts['reprocess'], 'w', encoding='utf-8', newline='', buffering=OUTPUT_WRITE_BUFFER) as reprocess_file:
+        writer = csv.writer(outfile, quoting=csv.QUOTE_ALL)
+        # Only the first chunk holds the header line
+        processed, written, skipped, line_count = norm._normalize_lines(
+            enumerate(infile, start=1), norm.input_has_header and index == 0, task['new_headers'],
+            writer, invalid_file, be_output_file, reprocess_file, defer_invalid=True)
+    return {'index': index, 'input_processed_rows': processed, 'output_written_rows': written,
+            'skipped_line_numbers': skipped, 'line_count': line_count, **parts}
+
 
 class ValidationError(Exception):
     """Custom exception for validation errors."""
@@ -48,6 +157,9 @@ class Normalizer:
         
         self.total_columns = gemini_result.get("total_columns")
         self.header_metadata = gemini_result.get("header_metadata", {})
+        # Lower-cased header -> column index, built on first use by _underline_invalid_field
+        self._header_idx = None
+        self._header_idx_source = None
     def _normalize_value(self, header: str, value: Any) -> Any:
         """
         Normalizes a single value based on its header.
@@ -71,41 +183,6 @@ class Normalizer:
             result = len(s) >= 2 and s.startswith('"') and s.endswith('"')
             return result
 
-        def split_unquoted_fields(field, delimiters):
-            # logger.debug(f"[SPLIT] split_unquoted_fields called with field: '{field}', delimiters: {delimiters}")
-            # Recursively split unquoted fields by any delimiter, skipping quoted regions
-            fields = []
-            queue = [field]
-            while queue:
-                current = queue.pop(0)
-                # logger.debug(f"[SPLIT] Processing queue item: '{current}'")
-                if is_quoted(current):
-                    # logger.debug(f"[SPLIT] Field is quoted, adding as-is: '{current}'")
-                    fields.append(current)
-                    continue
-                for delim in delimiters:
-                    # logger.debug(f"[SPLIT] Trying delimiter: '{delim}' in '{current}'")
-                    # Find delimiter outside quotes
-                    in_quotes = False
-                    for i, c in enumerate(current):
-                        if c == '"':
-                            in_quotes = not in_quotes
-                        if not in_quotes and current.startswith(delim, i):
-                            left = current[:i].strip()
-                            right = current[i+len(delim):].strip()
-                            # logger.debug(f"[SPLIT] Found delimiter '{delim}' at position {i}, splitting into: '{left}' and '{right}'")
-                            queue.insert(0, right)
-                            queue.insert(0, left)
-                            break
-                    else:
-                        continue
-                    break
-                else:
-                    # logger.debug(f"[SPLIT] No delimiters found in '{current}', adding as final field")
-                    fields.append(current)
-            # logger.debug(f"[SPLIT] split_unquoted_fields result: {fields}")
-            return fields
-
         if not self.column_separators:
             import csv
             result = next(csv.reader([line]))
@@ -164,7 +241,7 @@ class Normalizer:
         # logger.debug(f"[SPLIT] Fields after primary splitting: {fields}")
 
         # Now, if the last field is unquoted and contains fallback delimiters, split further
-        fallback_delimiters = [',', ';', '|', '\t', ':']
+        fallback_delimiters = FALLBACK_DELIMITERS
         last_col_idx = len(fields) - 1
         last_field = fields[-1]
         # logger.debug(f"[SPLIT] Checking last field for fallback splitting: '{last_field}' (index {last_col_idx})")
@@ -204,6 +281,165 @@ class Normalizer:
         # logger.debug(f"[SPLIT] Final result: {fields} (count: {len(fields)})")
         return fields
 
+    def _normalize_lines(self, row_iter, consume_header: bool, new_headers: List[str], writer, invalid_file,
+                         be_output_file, reprocess_file, defer_invalid: bool = False) -> Tuple[int, int, list, int]:
+        """
+        Split, validate and write the (row_num, line) pairs of a text file.
+        When defer_invalid is set, discarded rows are recorded as "row_num\tcolumn_count\tline" so the
+        caller can renumber and log them (see _normalize_text_parallel).
+        Returns (input_processed_rows, output_written_rows, skipped_line_numbers, last_row_num).
+        """
+        num_columns = self.total_columns
+        skipped_line_numbers = []
+        input_processed_rows = 0
+        output_written_rows = 0
+        row_num = 0
+        if consume_header:
+            # Si tiene cabecera, usar la primera línea como cabecera para reprocess
+            row_num, header_line = next(row_iter)
+            reprocess_file.write(header_line)
+            input_processed_rows += 1  # header processed
+        for row_num, line in row_iter:
+            # isspace() covers blank lines ('\n' included) without building a stripped copy
+            if line.isspace():
+                skipped_line_numbers.append(row_num)
+                continue
+            orig_line = line.rstrip('\n')
+            if self.column_separators:
+                row = self._split_row_by_separators(orig_line)
+            else:
+                row = next(csv.reader([orig_line]))
+            input_processed_rows += 1
+            if len(row) != num_columns:
+                if defer_invalid:
+                    invalid_file.write(f"{row_num}\t{len(row)}\t{orig_line}\n")
+                else:
+                    self._write_invalid_line(invalid_file, row_num, len(row), orig_line)
+                reprocess_file.write(orig_line + '\n')
+                skipped_line_numbers.append(row_num)
+                continue
+            processed_row = self._process_row(row)
+            writer.writerow(processed_row)
+            self._write_be_row(be_output_file, processed_row)
+            output_written_rows += 1
+        return input_processed_rows, output_written_rows, skipped_line_numbers, row_num
+
+    def _write_invalid_line(self, invalid_file, row_num: int, column_count: int, orig_line: str):
+        """Log a row with the wrong number of columns and record it in the invalid rows file."""
+        num_columns = self.total_columns
+        reason = f"Column count mismatch (got {column_count}, expected {num_columns})"
+        # Safe logging with Unicode handling
+        safe_line = orig_line
+        try:
+            # Try to encode/decode to handle Unicode safely
+            safe_line = orig_line.encode('utf-8', errors='replace').decode('utf-8')
+        except Exception:
+            safe_line = repr(orig_line)  # Use repr as fallback
+        logger.warning(f"Row {row_num} has {column_count} columns, expected {num_columns}. Discarding row: {safe_line}")
+        invalid_file.write(f"{row_num},{reason},\"{orig_line}\"\n")
+
+    def _build_be_row_layout(self, new_headers: List[str]) -> Tuple[List[Tuple[bytes, int]], bytes]:
+        """
+        Precompute the be_output NDJSON template for a file: a list of (json_prefix, column_index) pairs in output
+        order plus the closing suffix. Values of columns sharing a header end up in the same list, known headers
+        first and the rest under 'unclassified', e.g.
+        {"digid_email":["a@b.com"],"unclassified":{"password":["x"]}}
+        """
+        groups = {}
+        for i, header in enumerate(new_headers):
+            groups.setdefault(header, []).append(i)
+        known_groups = [(h, idxs) for h, idxs in groups.items() if h in known_header_keys]
+        unknown_groups = [(h, idxs) for h, idxs in groups.items() if h not in known_header_keys]
+        layout = []
+        opening = b'{'
+        for header, idxs in known_groups:
+            layout.append((opening + orjson.dumps(header) + b':[', idxs[0]))
+            layout.extend((b',', i) for i in idxs[1:])
+            opening = b'],'
+        opening += b'"unclassified":{'
+        for header, idxs in unknown_groups:
+            layout.append((opening + orjson.dumps(header) + b':[', idxs[0]))
+            layout.extend((b',', i) for i in idxs[1:])
+            opening = b'],'
+        if unknown_groups:
+            suffix = b']}}\n'
+        else:
+            suffix = opening + b'}}\n'
+        return layout, suffix
+
+    def _write_be_row(self, be_output_file, processed_row: List[Any]):
+        """Write one processed row to the (binary) be_output NDJSON file using the layout from _build_be_row_layout."""
+        layout, suffix = self._be_row_layout
+        dumps = orjson.dumps
+        be_output_file.write(b''.join([prefix + dumps(processed_row[i]) for prefix, i in layout]) + suffix)
+
+    def _plan_text_chunks(self, input_path: Path, encoding: str = None) -> List[int]:
+        """
+        Compute byte offsets [0, ..., file_size] splitting a text file into chunks for parallel normalization.
+        Every inner offset sits right after a newline. Returns [0, file_size] (a single chunk) for files below
+        NORMALIZE_PARALLEL_MIN_MB, single-worker setups, or encodings where b"\\n" is not a line break (UTF-16/32).
+        """
+        file_size = os.path.getsize(input_path)
+        workers = settings.NORMALIZE_WORKERS or os.cpu_count() or 1
+        try:
+            ascii_newline = '\n'.encode(encoding or 'utf-8') == b'\n'
+        except LookupError:
+            ascii_newline = False
+        if workers < 2 or not ascii_newline or file_size < settings.NORMALIZE_PARALLEL_MIN_MB * 1024 * 1024:
+            return [0, file_size]
+        bounds = [0]
+        with open(input_path, 'rb') as f:
+            for i in range(1, workers):
+                f.seek(max(file_size * i // workers, bounds[-1]))
+                f.readline()  # skip to the start of the next line
+                offset = f.tell()
+                if offset >= file_size:
+                    break
+                if offset > bounds[-1]:
+                    bounds.append(offset)
+        bounds.append(file_size)
+        return bounds
+
+    def _normalize_text_parallel(self, input_path: Path, encoding: str, chunk_bounds: List[int], tmp_parent: Path,
+                                 new_headers: List[str], outfile, invalid_file, be_output_file, reprocess_file) -> Tuple[int, int, list]:
+        """
+        Normalize each byte range of chunk_bounds in a worker process, then append the per-chunk outputs in order.
+        Chunk-local row numbers are shifted by the number of lines in the preceding chunks.
+        Returns (input_processed_rows, output_written_rows, skipped_line_numbers).
+        """
+        tasks = [
+            {'normalizer': self, 'index': i, 'input_path': str(input_path), 'encoding': encoding,
+             'start': chunk_bounds[i], 'end': chunk_bounds[i + 1], 'new_headers': new_headers}
+            for i in range(len(chunk_bounds) - 1)
+        ]
+        logger.info(f"Normalizing {input_path} in {len(tasks)} parallel chunks")
+        input_processed_rows = 0
+        output_written_rows = 0
+        skipped_line_numbers = []
+        with tempfile.TemporaryDirectory(prefix='normalize_', dir=tmp_parent) as tmp_dir:
+            for task in tasks:
+                task['tmp_dir'] = tmp_dir
+            # spawn: the API process runs several threads, forking it could inherit held locks
+            with multiprocessing.get_context('spawn').Pool(processes=len(tasks)) as pool:
+                results = sorted(pool.imap_unordered(_normalize_text_chunk, tasks), key=lambda r: r['index'])
+            outfile.flush()
+            be_output_file.flush()
+            reprocess_file.flush()
+            row_offset = 0
+            for result in results:
+                input_processed_rows += result['input_processed_rows']
+                output_written_rows += result['output_written_rows']
+                skipped_line_numbers.extend(row_offset + n for n in result['skipped_line_numbers'])
+                for target, part in ((outfile.buffer, 'output'), (be_output_file, 'be_output'), (reprocess_file.buffer, 'reprocess')):
+                    with open(result[part], 'rb') as src:
+                        shutil.copyfileobj(src, target, 1 << 20)
+                with open(result['invalid'], 'r', encoding='utf-8') as deferred:
+                    for record in deferred:
+                        local_row, column_count, orig_line = record.rstrip('\n').split('\t', 2)
+                        self._write_invalid_line(invalid_file, row_offset + int(local_row), int(column_count), orig_line)
+                row_offset += result['line_count']
+        return input_processed_rows, output_written_rows, skipped_line_numbers
+
     def normalize_file(self, input_path: Path, output_path: Path, be_output_path: Path, encoding: str = None) -> Tuple[bool, str, list, int, int, list, int]:
         """
         Single-pass normalization: verifies and normalizes in one go.
@@ -224,7 +460,6 @@ class Normalizer:
         if self.header_mapping is None or self.normalization_map is None or self.total_columns is None:
             logger.error("Normalizer not properly initialized with Gemini result.")
             return False, "Normalizer not properly initialized with Gemini result.", warnings, 0, 0, [], 0
-        known_header_keys = set(known_headers.keys())
         matched_columns_count = sum(1 for v in self.header_mapping.values() if v in known_header_keys)
         if matched_columns_count < 1:
             logger.error("No known headers matched in the file. At least one known header must be present to process the file. Aborting normalization.")
@@ -234,6 +469,8 @@ class Normalizer:
         input_processed_rows = 0
         num_columns = self.total_columns
         new_headers = [self.header_mapping.get(str(i), f"unknown_column_{i}") for i in range(num_columns)]
+        self._be_row_layout = self._build_be_row_layout(new_headers)
+        self._row_ops = self._build_row_ops(new_headers)
         input_base = Path(input_path).stem
         invalid_file_path = Path(settings.INVALID_DIR) / f"invalid_rows_{input_base}.csv"
         # If the name of the file ends with _itN, create reprocess file with _itn+1, else, do it with _it1
@@ -253,79 +490,41 @@ class Normalizer:
 
         logger.info(f"Nuevo archivo a crear: {reprocess_path}")
 
-        import os
         text_exts = ('.csv', '.tsv', '.psv', '.dat', '.data', '.txt')
         excel_exts = ('.xlsx', '.xls', '.ods')
         input_path_str = str(input_path)
         if input_path_str.lower().endswith(text_exts):
-            input_open_kwargs = {'encoding': encoding or 'utf-8'}
-            with open(input_path, 'r', **input_open_kwargs, errors='replace') as infile, \
-                 open(output_path, 'w', encoding='utf-8', newline='') as outfile, \
-                 open(invalid_file_path, 'w', encoding='utf-8') as invalid_file, \
-                 open(be_output_path, 'w', encoding='utf-8') as be_output_file, \
-                 open(reprocess_path, 'w', encoding='utf-8', newline='') as reprocess_file:
+            chunk_bounds = self._plan_text_chunks(input_path, encoding)
+            with open(output_path, 'w', encoding='utf-8', newline='', buffering=OUTPUT_WRITE_BUFFER) as outfile, \
+                 open(invalid_file_path, 'w', encoding='utf-8', buffering=OUTPUT_WRITE_BUFFER) as invalid_file, \
+                 open(be_output_path, 'wb', buffering=OUTPUT_WRITE_BUFFER) as be_output_file, \
+                 open(reprocess_path, 'w', encoding='utf-8', newline='', buffering=OUTPUT_WRITE_BUFFER) as reprocess_file:
 
                 import csv
                 writer = csv.writer(outfile, quoting=csv.QUOTE_ALL)
                 writer.writerow(new_headers)
                 output_written_rows += 1  # header written
                 invalid_file.write(f"Row_Number,Reason,Original_Line\n")
-                row_iter = enumerate(infile, start=1)
-                if self.input_has_header:
-                    # Si tiene cabecera, usar la primera línea como cabecera para reprocess
-                    header_line = next(infile)
-                    reprocess_file.write(header_line)
-                    # Retroceder el archivo para que row_iter siga funcionando
-                    infile.seek(0)
-                    next(row_iter)
-                    input_processed_rows += 1  # header processed
-                for row_num, line in row_iter:
-                    orig_line = line.rstrip('\n')
-                    if not orig_line.strip():
-                        skipped_line_numbers.append(row_num)
-                        continue
-                    if self.column_separators:
-                        row = self._split_row_by_separators(orig_line)
-                    else:
-                        import csv as pycsv
-                        row = next(pycsv.reader([orig_line]))
-                    input_processed_rows += 1
-                    if len(row) != num_columns:
-                        reason = f"Column count mismatch (got {len(row)}, expected {num_columns})"
-                        # Safe logging with Unicode handling
-                        safe_line = orig_line
-                        try:
-                            # Try to encode/decode to handle Unicode safely
-                            safe_line = orig_line.encode('utf-8', errors='replace').decode('utf-8')
-                        except Exception:
-                            safe_line = repr(orig_line)  # Use repr as fallback
-                        logger.warning(f"Row {row_num} has {len(row)} columns, expected {num_columns}. Discarding row: {safe_line}")
-                        invalid_file.write(f"{row_num},{reason},\"{orig_line}\"\n")
-                        reprocess_file.write(orig_line + '\n')
-                        skipped_line_numbers.append(row_num)
-                        continue
-                    processed_row = self._process_row(row, new_headers)
-                    writer.writerow(processed_row)
-                    be_row = {}
-                    unclassified_row = {}
-                    for i, value in enumerate(processed_row):
-                        known = new_headers[i] in known_header_keys
-                        target_dict = be_row if known else unclassified_row
-                        if new_headers[i] not in target_dict:
-                            target_dict[new_headers[i]] = []
-                        target_dict[new_headers[i]].append(value)
-                    be_row["unclassified"] = unclassified_row
-                    be_output_file.write(json.dumps(be_row, ensure_ascii=False) + "\n")
-                    output_written_rows += 1
+                if len(chunk_bounds) > 2:
+                    processed, written, skipped_line_numbers = self._normalize_text_parallel(
+                        input_path, encoding, chunk_bounds, output_path.parent, new_headers,
+                        outfile, invalid_file, be_output_file, reprocess_file)
+                else:
+                    with open(input_path, 'r', encoding=encoding or 'utf-8', errors='replace') as infile:
+                        processed, written, skipped_line_numbers, _ = self._normalize_lines(
+                            enumerate(infile, start=1), self.input_has_header, new_headers,
+                            writer, invalid_file, be_output_file, reprocess_file)
+                input_processed_rows += processed
+                output_written_rows += written
 
         elif input_path_str.lower().endswith(excel_exts):
             import csv
             import pandas as pd
             df = read_excel_file(input_path, encoding=encoding)
-            with open(output_path, 'w', encoding='utf-8', newline='') as outfile, \
-                 open(invalid_file_path, 'w', encoding='utf-8') as invalid_file, \
-                 open(be_output_path, 'w', encoding='utf-8') as be_output_file, \
-                 open(reprocess_path, 'w', encoding='utf-8') as reprocess_file:
+            with open(output_path, 'w', encoding='utf-8', newline='', buffering=OUTPUT_WRITE_BUFFER) as outfile, \
+                 open(invalid_file_path, 'w', encoding='utf-8', buffering=OUTPUT_WRITE_BUFFER) as invalid_file, \
+                 open(be_output_path, 'wb', buffering=OUTPUT_WRITE_BUFFER) as be_output_file, \
+                 open(reprocess_path, 'w', encoding='utf-8', buffering=OUTPUT_WRITE_BUFFER) as reprocess_file:
               
                 writer = csv.writer(outfile, quoting=csv.QUOTE_ALL)
                 writer.writerow(new_headers)
@@ -369,18 +568,9 @@ class Normalizer:
                         reprocess_file.write(','.join(str(cell) for cell in row_list) + '\n')
                         skipped_line_numbers.append(row_num)
                         continue
-                    processed_row = self._process_row(row_list, new_headers)
+                    processed_row = self._process_row(row_list)
                     writer.writerow(processed_row)
-                    be_row = {}
-                    unclassified_row = {}
-                    for i, value in enumerate(processed_row):
-                        known = new_headers[i] in known_header_keys
-                        target_dict = be_row if known else unclassified_row
-                        if new_headers[i] not in target_dict:
-                            target_dict[new_headers[i]] = []
-                        target_dict[new_headers[i]].append(value)
-                    be_row["unclassified"] = unclassified_row
-                    be_output_file.write(json.dumps(be_row, ensure_ascii=False) + "\n")
+                    self._write_be_row(be_output_file, processed_row)
                     output_written_rows += 1
         else:
             return False, "Unsupported file type for normalization", warnings, 0, 0, [], 0
@@ -429,7 +619,8 @@ class Normalizer:
     def _analyze_repetitive_patterns(self, output_path: Path, headers: List[str]):
         """
         Analyze the output file for repetitive substring patterns in each column.
-        Logs warnings for the longest substrings (length >= 3) that appear in more than 50% of rows in the same column.
+        Logs warnings for the longest substrings (of the lengths in PATTERN_SHINGLE_LENGTHS) that appear
+        in more than 50% of rows in the same column.
         Avoids reporting substrings that are contained within longer reported substrings.
         """
         try:
@@ -455,22 +646,22 @@ class Normalizer:
                 if len(non_empty_values) < 3:
                     continue
                 
-                # Extract all substrings of length >= 3 from all values in this column
-                substring_counts = {}
+                # Count fixed-length substrings (shingles) once per value in this column
+                substring_counts = Counter()
                 
                 for value in non_empty_values:
                     value_str = str(value).strip()
-                    if len(value_str) < 3:
+                    value_len = len(value_str)
+                    if value_len < 3:
                         continue
                     
-                    # Generate all substrings of length >= 3
-                    seen_substrings = set()  # Avoid counting same substring multiple times per value
-                    for i in range(len(value_str)):
-                        for j in range(i + 3, len(value_str) + 1):
-                            substring = value_str[i:j]
-                            if substring not in seen_substrings:
-                                seen_substrings.add(substring)
-                                substring_counts[substring] = substring_counts.get(substring, 0) + 1
+                    # A set avoids counting the same substring multiple times per value
+                    shingles = set()
+                    for length in PATTERN_SHINGLE_LENGTHS:
+                        if length > value_len:
+                            break
+                        shingles.update(value_str[i:i + length] for i in range(value_len - length + 1))
+                    substring_counts.update(shingles)
                 
                 # Find substrings that exceed the threshold
                 qualifying_substrings = []
@@ -478,6 +669,10 @@ class Normalizer:
                     if count > threshold and len(substring) >= 3:
                         qualifying_substrings.append((substring, count))
                 
+                # Join overlapping shingles back into the longer substring they were cut from
+                stitched = self._stitch_shingles(qualifying_substrings, substring_counts, non_empty_values, threshold)
+                qualifying_substrings = list({**dict(qualifying_substrings), **stitched}.items())
+                
                 # Sort by length (descending) then by count (descending)
                 qualifying_substrings.sort(key=lambda x: (-len(x[0]), -x[1]))
                 
@@ -506,22 +701,81 @@ class Normalizer:
             # Don't fail the normalization process if analysis fails
             pass
 
-    def _process_row(self, row: List[Any], new_headers: List[str]) -> List[Any]:
+    def _stitch_shingles(self, qualifying: List[Tuple[str, int]], substring_counts: Counter, values: List[str],
+                         threshold: float) -> Dict[str, int]:
+        """
+        Rebuild substrings longer than the shingle lengths from chains of overlapping qualifying shingles
+        (e.g. '@gmail.c' + 'gmail.co' + 'mail.com' -> '@gmail.com'), keeping them only if they still
+        appear in more than `threshold` values.
+        Chains are walked from their first shingle only. An extension is skipped without a scan when one
+        of its trailing shingles is counted in too few values; otherwise only the values that contain the
+        chain so far are searched.
+        """
+        shingles = sorted(substring for substring, _ in qualifying)
+        by_prefix = {}
+        for substring in shingles:
+            by_prefix.setdefault(substring[:-1], []).append(substring)
+        suffixes = {substring[1:] for substring in shingles}
+        # Shingles without a qualifying left neighbour first; the rest only if no chain went through them
+        order = ([substring for substring in shingles if substring[:-1] not in suffixes]
+                 + [substring for substring in shingles if substring[:-1] in suffixes])
+        visited = set()
+        stitched = {}
+        for substring in order:
+            if substring in visited:
+                continue
+            visited.add(substring)
+            overlap = len(substring) - 1
+            merged, count, hits = substring, 0, None
+            while True:
+                for nxt in by_prefix.get(merged[-overlap:], []):
+                    candidate = merged + nxt[-1]
+                    # Every value containing candidate contains its tail shingles, so their counts bound its count
+                    if any(substring_counts[candidate[-length:]] <= threshold
+                           for length in PATTERN_SHINGLE_LENGTHS if length <= len(candidate)):
+                        continue
+                    if hits is None:
+                        hits = [v for v in values if merged in v]
+                    candidate_hits = [v for v in hits if candidate in v]
+                    if len(candidate_hits) > threshold:
+                        merged, count, hits = candidate, len(candidate_hits), candidate_hits
+                        visited.add(nxt)
+                        break
+                else:
+                    break
+            if merged != substring:
+                stitched[merged] = count
+        return stitched
+
+    def _build_row_ops(self, new_headers: List[str]) -> List[Tuple[int, str, str]]:
+        """
+        Precompute the work _process_row has to do for a file: (column_index, prefix_to_strip, header_to_normalize)
+        for the columns that have a strip prefix or are flagged in normalization_map. Other columns are left as-is.
+        """
+        row_ops = []
+        for i, header in enumerate(new_headers):
+            prefix = self.strip_prefixes.get(str(i))
+            normalize_header = header if self.normalization_map.get(header, False) else None
+            if prefix or normalize_header is not None:
+                row_ops.append((i, prefix, normalize_header))
+        return row_ops
+
+    def _process_row(self, row: List[Any]) -> List[Any]:
         """Processes a single row for normalization, including stripping prefixes if specified."""
-        processed_row = []
-        for i, value in enumerate(row):
-            header = new_headers[i]
+        if not self._row_ops:
+            # Nothing to strip or normalize for this file
+            return row
+        processed_row = list(row)
+        for i, prefix, normalize_header in self._row_ops:
+            val = processed_row[i]
             # Strip prefix if specified for this column
-            prefix = self.strip_prefixes.get(str(i))
-            val = value
             if prefix and isinstance(val, str):
                 if val.startswith(prefix):
                     val = val[len(prefix):].lstrip()
             # Check the normalization map to see if this column should be normalized
-            if self.normalization_map.get(header, False):
-                processed_row.append(self._normalize_value(header, val))
-            else:
-                processed_row.append(val)
+            if normalize_header is not None:
+                val = self._normalize_value(normalize_header, val)
+            processed_row[i] = val
         return processed_row
 
     def _validate_header(self, header: List[str]) -> bool:
@@ -558,7 +812,7 @@ class Normalizer:
                 
         elif field_type == 'phone':
             # Strip non-numeric chars except + for country code
-            field = re.sub(r'[^\d+]', '', field)
+            field = _PHONE_STRIP_RE.sub('', field)
             
         return field
 
@@ -583,7 +837,7 @@ class Normalizer:
 
     def _validate_phone(self, field: str, row_num: int, col_name: str):
         # Basic phone validation (adjust pattern as needed)
-        if not re.match(r'^\+?[\d\s\-\(\)]+$', field):
+        if not _PHONE_RE.match(field):
             raise ValidationError(f"Row {row_num}, Column {col_name}: Invalid phone number format")
 
     def _verify_row(self, row: List[Any], new_headers: List[str]) -> Tuple[bool, str]:
@@ -600,7 +854,7 @@ class Normalizer:
             val = str(value).strip('"\'')
             # Phone number check
             if "phone" in header_lower:
-                if val and not re.match(r'^\+?[\d\s\-()]+$', val):
+                if val and not _PHONE_RE.match(val):
                     return False, f"Phone number contains invalid characters in column '{header_lower}'"
             # Person name check (simple: header contains 'name', not 'company', not 'filename', not 'username', etc.)
             if "name" in header_lower and not any(x in header_lower for x in ["company", "filename", "username"]):
@@ -618,15 +872,18 @@ class Normalizer:
         """
         Returns a string of the row with the invalid field wrapped in triple underscores (___field___), based on the reason message.
         """
-        import re
         # Try to extract the column name from the reason
-        match = re.search(r"column '([^']+)'", reason)
+        match = _COLUMN_REASON_RE.search(reason)
         if not match:
             return str(row)
         col_name = match.group(1)
-        try:
-            idx = [h.lower() for h in headers].index(col_name)
-        except ValueError:
+        if self._header_idx_source is not headers:
+            self._header_idx = {}
+            for i, h in enumerate(headers):
+                self._header_idx.setdefault(h.lower(), i)
+            self._header_idx_source = headers
+        idx = self._header_idx.get(col_name)
+        if idx is None:
             return str(row)
         underlined = f"___{row[idx]}___"
         row_copy = list(row)
@@ -1,16 +1,28 @@
 """
 Pipeline Orchestrator module for coordinating tabular file processing stages (CSV, XLS, XLSX).
 """
+import asyncio
+import errno
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import multiprocessing
+import os
+import queue
+from contextvars import ContextVar
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable
 from datetime import datetime, timezone
 import shutil
 from uuid import UUID
 import json
 import re
+import orjson
 from enum import Enum
+from types import MappingProxyType
 
-from ..models.pipeline_run import PipelineRun
+from ..models.pipeline_run import PipelineRun, init_db
 from ..config.settings import settings
 from . import classifier, sampler, gemini_query, normalizer
 
@@ -29,6 +41,54 @@ class Status(Enum):
     ERROR = 'error'
     SKIPPED = 'skipped'
 
+# Id of the run whose stage is executing in the current task/thread; set by run_pipeline
+_current_run_id: ContextVar[str | None] = ContextVar('pipeline_run_id', default=None)
+
+class _RunLogFilter(logging.Filter):
+    """Let through only the records emitted while processing the given run."""
+    def __init__(self, run_id: str):
+        super().__init__()
+        self.run_id = run_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return _current_run_id.get() == self.run_id
+
+@dataclass
+class StageMsg:
+    """A file travelling through the run_pipeline stage queues."""
+    run_id: str
+    file_path: Path
+    class_result: dict | None = None
+    automatic: bool = False
+    sample_data: list | None = None
+    mapping: dict | None = None
+
+# Orchestrator of a process_files worker process, built once by _init_file_worker
+_worker_orchestrator = None
+# Seconds a process_files worker waits for the SQLite write lock held by another worker's checkpoint commit
+WORKER_DB_BUSY_TIMEOUT = 60
+
+def _init_file_worker(db_url: str):
+    global _worker_orchestrator
+    _worker_orchestrator = PipelineOrchestrator(init_db(db_url, busy_timeout=WORKER_DB_BUSY_TIMEOUT))
+
+def _file_size(path: Path) -> int:
+    """Size used to order process_files submissions; a file that vanished sorts last and fails in its worker."""
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+def _process_file_in_worker(file_path: str) -> UUID:
+    return _worker_orchestrator.process_file(file_path)
+
+# Stage statuses that count as finished when deciding whether a run is OK
+DONE_STATUSES = frozenset({Status.OK.value, Status.SKIPPED.value})
+
+def _dumps(obj) -> str:
+    """Serialize obj for the JSON text columns of PipelineRun (compact, non-ASCII kept as is)."""
+    return orjson.dumps(obj).decode('utf-8')
+
 def ensure_aware(dt):
     if dt is None:
         return None
@@ -45,7 +105,8 @@ class PipelineOrchestrator:
             db_session_factory: A function that returns a new SQLAlchemy database session
         """
         self.db_session_factory = db_session_factory
-        
+        self._known_headers = self._load_known_headers()
+
     def process_file(self, file_path: str | Path, db_session=None, start_from_stage: Stage = None, run_id: str = None) -> UUID:
         """
         Process a single tabular file through all pipeline stages.
@@ -60,10 +121,198 @@ class PipelineOrchestrator:
         if db_session is None:
             db_session = self.db_session_factory()
             close_session = True
+        # Keep `run` loaded across the checkpoint commits instead of reloading it after each one
+        expire_on_commit = db_session.expire_on_commit
+        db_session.expire_on_commit = False
 
         file_path = Path(file_path)
         filename = file_path.name
+        run = self._open_run(filename, db_session, run_id)
+        # Parse stage_stats again on first use: the run may be a stale instance of a long-lived session
+        run._stage_stats_cache = None
+
+        try:
+            log_file = Path(settings.LOGS_DIR) / f"{run.id}_{filename}.log"
+            log_listener = self._setup_logging(log_file)
+            run.log_file_path = str(log_file)
+
+            class_result, automatic = self._run_classification(run, file_path, db_session, start_from_stage)
+            excel_df = class_result.pop('dataframe', None)
+            if automatic:
+                mapping = self._automatic_mapping(run, filename, class_result)
+            else:
+                sample_data = self._run_sampling(run, file_path, excel_df)
+                mapping = self._run_gemini_query(run, sample_data, db_session)
+            return self._run_normalization(run, file_path, mapping, db_session)
+
+        except Exception as e:
+            return self._fail_run(run, file_path, e, db_session)
+        finally:
+            # Drain and close the file handler to prevent log mixing between files
+            try:
+                if 'log_listener' in locals():
+                    self._teardown_logging(log_listener)
+            except Exception:
+                pass
+            run._stage_stats_cache = None
+            db_session.expire_on_commit = expire_on_commit
+            if close_session:
+                db_session.close()
 
+    async def run_pipeline(self, files: Iterable[str | Path], queue_size: int = 4) -> list[UUID]:
+        """
+        Process several new files with the stages overlapped across files.
+
+        Each stage has its own worker and database session, and the workers are chained
+        by bounded queues, so while one file is being normalized the next one can already
+        be waiting on Gemini and a third one being classified. Blocking stage code runs in
+        worker threads; per-run log files only receive the records of their own run.
+
+        Args:
+            files: Paths of the files to process
+            queue_size: Maximum number of files waiting between two stages
+
+        Returns:
+            The run ids, in completion order
+        """
+        enqueued = asyncio.Queue(maxsize=queue_size)
+        classified = asyncio.Queue(maxsize=queue_size)
+        sampled = asyncio.Queue(maxsize=queue_size)
+        mapped = asyncio.Queue(maxsize=queue_size)
+        done: list[UUID] = []
+        log_handlers: dict[str, logging.Handler] = {}
+
+        def finish(msg: StageMsg):
+            handler = log_handlers.pop(msg.run_id, None)
+            if handler is not None:
+                logging.getLogger().removeHandler(handler)
+                handler.close()
+            done.append(msg.run_id)
+
+        def checkpoint(stage_fn, msg: StageMsg, db_session) -> bool:
+            """Run one stage for one file; on failure record the error and return False."""
+            run = None
+            try:
+                run = db_session.get(PipelineRun, msg.run_id)
+                stage_fn(run, msg, db_session)
+                self._flush(run, db_session)
+                return True
+            except Exception as e:
+                if run is None:
+                    logger.error(f"Pipeline failed for {msg.file_path.name}: {str(e)}", exc_info=True)
+                    return False
+                try:
+                    self._fail_run(run, msg.file_path, e, db_session)
+                except Exception as fail_error:
+                    # The stage error is already logged by _fail_run; the file still has to leave the pipeline
+                    logger.error(f"Could not record the failure of run {msg.run_id}: {fail_error}", exc_info=True)
+                    db_session.rollback()
+                return False
+
+        async def stage_worker(stage_fn, inbox: asyncio.Queue, outbox: asyncio.Queue | None):
+            db_session = self.db_session_factory()
+            db_session.expire_on_commit = False
+            try:
+                while (msg := await inbox.get()) is not None:
+                    _current_run_id.set(msg.run_id)
+                    ok = False
+                    try:
+                        ok = await asyncio.to_thread(checkpoint, stage_fn, msg, db_session)
+                        if ok and outbox is not None:
+                            await outbox.put(msg)
+                    finally:
+                        # A file leaves the pipeline after the last stage or at its first failure
+                        if not ok or outbox is None:
+                            finish(msg)
+            finally:
+                # Always pass the end of the stream on, so the downstream workers and gather() return
+                if outbox is not None:
+                    await outbox.put(None)
+                db_session.close()
+
+        def classify(run, msg: StageMsg, db_session):
+            run.log_file_path = str(Path(settings.LOGS_DIR) / f"{run.id}_{msg.file_path.name}.log")
+            log_handlers[run.id] = self._add_run_log_handler(Path(run.log_file_path), run.id)
+            msg.class_result, msg.automatic = self._run_classification(run, msg.file_path, db_session)
+
+        def sample(run, msg: StageMsg, db_session):
+            excel_df = msg.class_result.pop('dataframe', None)
+            if msg.automatic:
+                msg.mapping = self._automatic_mapping(run, msg.file_path.name, msg.class_result)
+            else:
+                msg.sample_data = self._run_sampling(run, msg.file_path, excel_df)
+
+        def query_gemini(run, msg: StageMsg, db_session):
+            if msg.mapping is None:
+                msg.mapping = self._run_gemini_query(run, msg.sample_data, db_session)
+
+        def normalize(run, msg: StageMsg, db_session):
+            self._run_normalization(run, msg.file_path, msg.mapping, db_session)
+
+        async def enqueue_worker():
+            db_session = self.db_session_factory()
+            try:
+                for file_path in files:
+                    file_path = Path(file_path)
+                    try:
+                        run = await asyncio.to_thread(self._open_run, file_path.name, db_session)
+                    except Exception as e:
+                        logger.error(f"Could not open a run for {file_path.name}: {e}", exc_info=True)
+                        db_session.rollback()
+                        continue
+                    await enqueued.put(StageMsg(run_id=run.id, file_path=file_path))
+            finally:
+                await enqueued.put(None)
+                db_session.close()
+
+        await asyncio.gather(
+            enqueue_worker(),
+            stage_worker(classify, enqueued, classified),
+            stage_worker(sample, classified, sampled),
+            stage_worker(query_gemini, sampled, mapped),
+            stage_worker(normalize, mapped, None),
+        )
+        return done
+
+    def process_files(self, paths: Iterable[str | Path], workers: int = None, db_url: str = None) -> list[UUID]:
+        """
+        Process independent files in parallel, each one through process_file in a worker process.
+
+        Files are submitted largest first so a big file started last does not leave the
+        other workers idle at the end of the batch. Every worker connects to the database
+        with its own engine and sessions, waiting up to WORKER_DB_BUSY_TIMEOUT seconds for
+        the write lock of the others.
+
+        Args:
+            paths: Paths of the files to process
+            workers: Number of worker processes (default: one per CPU)
+            db_url: Database the workers record their runs in (default: settings.DATABASE_URL)
+
+        Returns:
+            The run ids, in completion order
+        """
+        paths = sorted((Path(p) for p in paths), key=_file_size, reverse=True)
+        if not paths:
+            return []
+        workers = min(workers or os.cpu_count() or 1, len(paths))
+        db_url = db_url or settings.DATABASE_URL
+        run_ids = []
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_file_worker,
+            initargs=(db_url,),
+        ) as executor:
+            futures = {executor.submit(_process_file_in_worker, str(p)): p for p in paths}
+            for future in as_completed(futures):
+                try:
+                    run_ids.append(future.result())
+                except Exception as e:
+                    logger.error(f"Worker failed to process {futures[future].name}: {e}", exc_info=True)
+        return run_ids
+
+    def _open_run(self, filename: str, db_session, run_id: str = None) -> PipelineRun:
+        """Return the run to process: the given run_id, the enqueued run of the file, or a new one."""
         # Si tenemos un run_id, recuperar ese run específico
         if run_id:
             run = db_session.query(PipelineRun).filter_by(id=run_id).first()
@@ -76,262 +325,268 @@ class PipelineOrchestrator:
                 run = PipelineRun(filename=filename, status=Status.ENQUEUED.value)
                 db_session.add(run)
                 db_session.commit()
+        return run
 
-        try:
-            log_file = Path(settings.LOGS_DIR) / f"{run.id}_{filename}.log"
-            file_handler = self._setup_logging(log_file)
-            run.log_file_path = str(log_file)
-            
-            # Set status to RUNNING at the start of actual processing
-            run.status = Status.RUNNING.value
-            db_session.commit()
-            # Si estamos reiniciando desde una etapa específica, saltamos las etapas anteriores
-            should_run_classification = not start_from_stage or start_from_stage == Stage.CLASSIFICATION
+    def _run_classification(self, run: PipelineRun, file_path: Path, db_session, start_from_stage: Stage = None) -> tuple[dict, bool]:
+        """Classify the file (or reuse the stored result when resuming) and tell whether the mapping is automatic."""
+        # Set status to RUNNING at the start of actual processing
+        run.status = Status.RUNNING.value
+        # Si estamos reiniciando desde una etapa específica, saltamos las etapas anteriores
+        should_run_classification = not start_from_stage or start_from_stage == Stage.CLASSIFICATION
+        
+        if should_run_classification:
+            self._update_stage(run, Stage.CLASSIFICATION, Status.RUNNING)
+            self._flush(run, db_session)
+            class_result = classifier.classify_file(file_path)
+            run.file_encoding = class_result['encoding'].lower() if class_result['encoding'] else None
+            run.original_file_size = class_result['file_size']
+            run.original_row_count = class_result['row_count']
+            automatic = class_result.get('known_per', 0) >= 90
+        else:
+        # Construir class_result con los datos que ya tenemos en el run
+            class_result = {
+                'is_tabular': True,  # Si llegó más allá de la clasificación, era tabular
+                'file_size': run.original_file_size,
+                'row_count': run.original_row_count,
+                'encoding': run.file_encoding,
+                'warnings': [],
+                'error_message': None,
+            }
+            self._flush(run, db_session)
+            # Verificar en stage_stats si el procesamiento fue automático
+            stage_stats = self._stage_stats(run)
+            # Si Gemini y Sampling están marcados como SKIPPED, significa que fue automático
+            automatic = (stage_stats.get('sampling', {}).get('status') == Status.SKIPPED.value and 
+                       stage_stats.get('gemini_query', {}).get('status') == Status.SKIPPED.value)
             
-            if should_run_classification:
-                self._update_stage(run, Stage.CLASSIFICATION, Status.RUNNING, db_session=db_session)
-                class_result = classifier.classify_file(file_path)
-                run.file_encoding = class_result['encoding'].lower() if class_result['encoding'] else None
-                run.original_file_size = class_result['file_size']
-                run.original_row_count = class_result['row_count']
-                automatic = class_result.get('known_per', 0) >= 90
-            else:
-            # Construir class_result con los datos que ya tenemos en el run
-                class_result = {
-                    'is_tabular': True,  # Si llegó más allá de la clasificación, era tabular
-                    'file_size': run.original_file_size,
-                    'row_count': run.original_row_count,
-                    'encoding': run.file_encoding,
-                    'warnings': [],
-                    'error_message': None,
-                }
-                # Verificar en stage_stats si el procesamiento fue automático
-                stage_stats = json.loads(run.stage_stats) if run.stage_stats else {}
-                # Si Gemini y Sampling están marcados como SKIPPED, significa que fue automático
-                automatic = (stage_stats.get('sampling', {}).get('status') == Status.SKIPPED.value and 
-                           stage_stats.get('gemini_query', {}).get('status') == Status.SKIPPED.value)
-                
-            if not class_result['is_tabular']:
-                self._update_stage(
-                    run, Stage.CLASSIFICATION, Status.ERROR,
-                    error_message=class_result['error_message'] or 'File is not tabular',
-                    warning='; '.join(class_result.get('warnings', [])) if class_result.get('warnings') else None,
-                    db_session=db_session
-                )
-                raise ValueError(class_result['error_message'] or 'File is not tabular')
+        if not class_result['is_tabular']:
             self._update_stage(
-                run, Stage.CLASSIFICATION, Status.OK,
-                warning='; '.join(class_result.get('warnings', [])) if class_result.get('warnings') else None,
-                db_session=db_session
+                run, Stage.CLASSIFICATION, Status.ERROR,
+                error_message=class_result['error_message'] or 'File is not tabular',
+                warning='; '.join(class_result.get('warnings', [])) if class_result.get('warnings') else None
             )
-            if automatic:
-                logger.info(f"Automatic classification for {filename} with known percentage: {class_result['known_per']}%")
-                # Create JSON with header mapping and normalization info
-                json_data = {"header_mapping": {}, "normalization_map": {}}
-                standardized_headers = class_result.get('standardized_headers', [])
-                normalize_flags = class_result.get('normalize_flags', [])
-                known_columns_count = class_result.get('known_columns_count', 0)
-                total_columns_count = class_result.get('total_columns_count', 0)
-                separators_list = class_result.get('separators_list', [])
-                
-                # Load known headers to get descriptions
-                import json as json_lib
-                known_headers_path = Path(__file__).parent / "known_headers.json"
-                try:
-                    with open(known_headers_path, 'r', encoding='utf-8') as f:
-                        known_headers = json_lib.load(f)
-                except Exception as e:
-                    logger.warning(f"Could not load known_headers.json: {e}")
-                    known_headers = {}
-                
-                # Build the header mapping with normalization info and descriptions
-                json_data["header_metadata"] = {}
-                for i, header in enumerate(standardized_headers):
-                    should_normalize = normalize_flags[i] if i < len(normalize_flags) else False
-                    json_data["header_mapping"][f"{i}"] = header
-                    json_data["normalization_map"][header] = should_normalize
-                    
-                    # Add metadata for all headers (known and unknown)
-                    if header in known_headers:
-                        description = known_headers[header].get("description", "")
-                        json_data["header_metadata"][header] = {
-                            "is_known": True,
-                            "description": description
-                        }
-                    else:
-                        json_data["header_metadata"][header] = {
-                            "is_known": False,
-                            "description": ""
-                        }
-                
-                json_data["matched_columns_count"] = known_columns_count
-                json_data["input_has_header"] = True
-                json_data["total_columns"] = total_columns_count
-                json_data["column_separators"] = separators_list
-
-
-                logger.info(f"Complete classification data for {filename}: {json.dumps(json_data, indent=2)}")
-                self._update_stage(run, Stage.SAMPLING, Status.SKIPPED, db_session=db_session)
-                self._update_stage(run, Stage.GEMINI_QUERY, Status.SKIPPED, db_session=db_session)
-                db_session.commit()
-                mapping,input_tokens, output_tokens, total_tokens = json_data,0,0,0
-                run.gemini_header_mapping = json.dumps(mapping)
-                run.gemini_input_tokens = input_tokens
-                run.gemini_output_tokens = output_tokens
-                run.gemini_total_tokens = total_tokens
-                run.estimated_cost = (
-                    (run.gemini_input_tokens or 0) * 0.30 / 1_000_000 +
-                    (run.gemini_output_tokens or 0) * 2.50 / 1_000_000
-                )
-            else:
-                
-                
-                self._update_stage(run, Stage.SAMPLING, Status.RUNNING, db_session=db_session)
-                sample_data, error_msg, sample_warnings = sampler.extract_sample(file_path, encoding=run.file_encoding)
-                if error_msg:
-                    self._update_stage(run, Stage.SAMPLING, Status.ERROR, error_message=error_msg, warning='; '.join(sample_warnings) if sample_warnings else None, db_session=db_session)
-                    raise ValueError(error_msg)
-                
-                # Store the sampled rows for frontend access immediately after sampling
-                try:
-                    run.gemini_sample_rows = json.dumps(sample_data)
-                except Exception as e:
-                    error_msg = f"Failed to serialize gemini_sample_rows: {str(e)}"
-                    self._update_stage(run, Stage.SAMPLING, Status.ERROR, error_message=error_msg, warning='; '.join(sample_warnings) if sample_warnings else None, db_session=db_session)
-                    logger.error(error_msg)
-                    raise ValueError(error_msg)
-                db_session.commit()
-                self._update_stage(run, Stage.SAMPLING, Status.OK, warning='; '.join(sample_warnings) if sample_warnings else None, db_session=db_session)
-
-                self._update_stage(run, Stage.GEMINI_QUERY, Status.RUNNING, db_session=db_session)
-                mapping, error_msg, gemini_warnings, input_tokens, output_tokens, total_tokens = gemini_query.run_gemini(sample_data)
-                if error_msg:
-                    self._update_stage(run, Stage.GEMINI_QUERY, Status.ERROR, error_message=error_msg, warning='; '.join(gemini_warnings) if gemini_warnings else None, db_session=db_session)
-                    raise ValueError(error_msg)
-                run.gemini_header_mapping = json.dumps(mapping)
-                run.gemini_input_tokens = input_tokens
-                run.gemini_output_tokens = output_tokens
-                run.gemini_total_tokens = total_tokens
-                run.estimated_cost = (
-                    (run.gemini_input_tokens or 0) * 0.30 / 1_000_000 +
-                    (run.gemini_output_tokens or 0) * 2.50 / 1_000_000
-                )
-                self._update_stage(run, Stage.GEMINI_QUERY, Status.OK, warning='; '.join(gemini_warnings) if gemini_warnings else None, db_session=db_session)
-
-            self._update_stage(run, Stage.NORMALIZATION, Status.RUNNING, db_session=db_session)
-            norm = normalizer.Normalizer(mapping)
-            output_base = Path(filename).stem
-            output_path = Path(settings.OUTPUT_DIR) / f"normalized_{output_base}.csv"
-            be_output_path = Path(settings.BE_OUTPUT_DIR) / f"be_normalized_{output_base}.json"
-            success, error_msg, norm_warnings, output_written_rows, input_processed_rows, norm_invalid_lines, output_file_size, be_output_file_size = norm.normalize_file(file_path, output_path,be_output_path, encoding=run.file_encoding)
-            if not success:
-                self._update_stage(run, Stage.NORMALIZATION, Status.ERROR, error_message=error_msg, warning='; '.join(norm_warnings) if norm_warnings else None, db_session=db_session)
-                raise ValueError(error_msg)
-            run.final_file_size = output_file_size
-            run.final_row_count = output_written_rows
-            if run.original_row_count and run.final_row_count is not None and run.original_row_count > 0:
-                run.valid_row_percentage = round((run.final_row_count / run.original_row_count) * 100, 2)
-            self._update_stage(run, Stage.NORMALIZATION, Status.OK, warning='; '.join(norm_warnings) if norm_warnings else None, db_session=db_session)
-            if norm_invalid_lines:
-                # Always treat as a list of line numbers
-                serializable_invalid_lines = []
-                for item in sorted(norm_invalid_lines):
-                    if isinstance(item, datetime):
-                        serializable_invalid_lines.append(item.isoformat())
-                    else:
-                        serializable_invalid_lines.append(item)
-                run.invalid_line_numbers = json.dumps(serializable_invalid_lines)
-
-            # Check if all stages are OK or SKIPPED to mark as finished
-            stage_stats = json.loads(run.stage_stats) if run.stage_stats else {}
-            all_ok = all(
-                stage_stats.get(stage.value, {}).get('status') in [Status.OK.value, Status.SKIPPED.value]
-                for stage in [Stage.CLASSIFICATION, Stage.SAMPLING, Stage.GEMINI_QUERY, Stage.NORMALIZATION]
-            )
-            if all_ok:
-                run.status = Status.OK.value
-                run.end_time = datetime.now(timezone.utc)
-                start = ensure_aware(run.start_time)
-                end = ensure_aware(run.end_time)
-                run.duration_ms = int((end - start).total_seconds() * 1000)
-                run.error_message = "success"
-                db_session.commit()
-                
-                # Calculate detailed processing statistics
-                original_input_lines = run.original_row_count or 0
-                original_non_empty_lines = input_processed_rows
-                invalid_lines_count = len(norm_invalid_lines) if norm_invalid_lines else 0
-                normalized_output_lines = output_written_rows
-                
-                logger.info(f"Successfully processed {filename}")
-                logger.info(f"Processing statistics for {filename}:")
-                logger.info(f"  - Original input lines: {original_input_lines}")
-                logger.info(f"  - Original non-empty lines processed: {original_non_empty_lines}")
-                logger.info(f"  - Invalid lines (blank/malformed): {invalid_lines_count}")
-                logger.info(f"  - Lines written to normalized output: {normalized_output_lines}")
-                logger.info(f"  - Valid row percentage: {run.valid_row_percentage}%")
-                logger.info(f"  - Processing duration: {run.duration_ms}ms")
-            else:
-                logger.error(f"Normalization not completed for {filename}, not marking as ok.")
-            return run.id
+            # Commit the classification results so the rollback in _fail_run keeps them
+            self._flush(run, db_session)
+            raise ValueError(class_result['error_message'] or 'File is not tabular')
+        self._update_stage(
+            run, Stage.CLASSIFICATION, Status.OK,
+            warning='; '.join(class_result.get('warnings', [])) if class_result.get('warnings') else None
+        )
+        self._flush(run, db_session)
+        return class_result, automatic
+
+    def _automatic_mapping(self, run: PipelineRun, filename: str, class_result: dict) -> dict:
+        """Build the mapping from the classifier's known headers, skipping sampling and Gemini."""
+        logger.info(f"Automatic classification for {filename} with known percentage: {class_result['known_per']}%")
+        standardized_headers = class_result.get('standardized_headers', [])
+        normalize_flags = class_result.get('normalize_flags', [])
+        known_columns_count = class_result.get('known_columns_count', 0)
+        total_columns_count = class_result.get('total_columns_count', 0)
+        separators_list = class_result.get('separators_list', [])
+        # Headers without a flag are not normalized
+        normalize_flags = list(normalize_flags) + [False] * (len(standardized_headers) - len(normalize_flags))
+
+        # Create JSON with header mapping, normalization info and descriptions of all headers (known and unknown)
+        known_headers = self._known_headers
+        json_data = {
+            "header_mapping": {str(i): header for i, header in enumerate(standardized_headers)},
+            "normalization_map": dict(zip(standardized_headers, normalize_flags)),
+            "header_metadata": {
+                header: {"is_known": True, "description": known_headers[header].get("description", "")}
+                if header in known_headers else {"is_known": False, "description": ""}
+                for header in standardized_headers
+            },
+        }
+
+        json_data["matched_columns_count"] = known_columns_count
+        json_data["input_has_header"] = True
+        json_data["total_columns"] = total_columns_count
+        json_data["column_separators"] = separators_list
+
 
+        logger.info(f"Complete classification data for {filename}: {json.dumps(json_data, indent=2)}")
+        self._update_stage(run, Stage.SAMPLING, Status.SKIPPED)
+        self._update_stage(run, Stage.GEMINI_QUERY, Status.SKIPPED)
+        self._store_mapping(run, json_data, 0, 0, 0)
+        return json_data
+
+    def _run_sampling(self, run: PipelineRun, file_path: Path, excel_df=None) -> list:
+        """
+        Extract the sample rows sent to Gemini and keep them on the run for the frontend.
+        excel_df is the sheet the classifier already read, if any.
+        """
+        self._update_stage(run, Stage.SAMPLING, Status.RUNNING)
+        sample_data, error_msg, sample_warnings = sampler.extract_sample(file_path, encoding=run.file_encoding, dataframe=excel_df)
+        if error_msg:
+            self._update_stage(run, Stage.SAMPLING, Status.ERROR, error_message=error_msg, warning='; '.join(sample_warnings) if sample_warnings else None)
+            raise ValueError(error_msg)
+        
+        # Store the sampled rows for frontend access immediately after sampling
+        try:
+            run.gemini_sample_rows = _dumps(sample_data)
         except Exception as e:
-            db_session.rollback()
-            logger.error(f"Pipeline failed for {filename}: {str(e)}")
-            run.status = Status.ERROR.value
+            error_msg = f"Failed to serialize gemini_sample_rows: {str(e)}"
+            self._update_stage(run, Stage.SAMPLING, Status.ERROR, error_message=error_msg, warning='; '.join(sample_warnings) if sample_warnings else None)
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        self._update_stage(run, Stage.SAMPLING, Status.OK, warning='; '.join(sample_warnings) if sample_warnings else None)
+        return sample_data
+
+    def _run_gemini_query(self, run: PipelineRun, sample_data: list, db_session) -> dict:
+        """Ask Gemini for the header mapping of the sampled rows."""
+        self._update_stage(run, Stage.GEMINI_QUERY, Status.RUNNING)
+        self._flush(run, db_session)
+        mapping, error_msg, gemini_warnings, input_tokens, output_tokens, total_tokens = gemini_query.run_gemini(sample_data)
+        if error_msg:
+            self._update_stage(run, Stage.GEMINI_QUERY, Status.ERROR, error_message=error_msg, warning='; '.join(gemini_warnings) if gemini_warnings else None)
+            raise ValueError(error_msg)
+        self._store_mapping(run, mapping, input_tokens, output_tokens, total_tokens)
+        self._update_stage(run, Stage.GEMINI_QUERY, Status.OK, warning='; '.join(gemini_warnings) if gemini_warnings else None)
+        return mapping
+
+    def _store_mapping(self, run: PipelineRun, mapping: dict, input_tokens: int, output_tokens: int, total_tokens: int):
+        """Save the header mapping and the Gemini token usage on the run (the cost is derived from it)."""
+        run.gemini_header_mapping = _dumps(mapping)
+        run.gemini_input_tokens = input_tokens
+        run.gemini_output_tokens = output_tokens
+        run.gemini_total_tokens = total_tokens
+
+    def _run_normalization(self, run: PipelineRun, file_path: Path, mapping: dict, db_session) -> UUID:
+        """Normalize the file with the mapping and close the run."""
+        filename = file_path.name
+        self._update_stage(run, Stage.NORMALIZATION, Status.RUNNING)
+        self._flush(run, db_session)
+        norm = normalizer.Normalizer(mapping)
+        output_base = file_path.stem
+        output_path = Path(settings.OUTPUT_DIR) / f"normalized_{output_base}.csv"
+        be_output_path = Path(settings.BE_OUTPUT_DIR) / f"be_normalized_{output_base}.json"
+        success, error_msg, norm_warnings, output_written_rows, input_processed_rows, norm_invalid_lines, output_file_size, be_output_file_size = norm.normalize_file(file_path, output_path,be_output_path, encoding=run.file_encoding)
+        if not success:
+            self._update_stage(run, Stage.NORMALIZATION, Status.ERROR, error_message=error_msg, warning='; '.join(norm_warnings) if norm_warnings else None)
+            raise ValueError(error_msg)
+        run.final_file_size = output_file_size
+        run.final_row_count = output_written_rows
+        if run.original_row_count and run.final_row_count is not None and run.original_row_count > 0:
+            run.valid_row_percentage = round((run.final_row_count / run.original_row_count) * 100, 2)
+        self._update_stage(run, Stage.NORMALIZATION, Status.OK, warning='; '.join(norm_warnings) if norm_warnings else None)
+        if norm_invalid_lines:
+            # Always treat as a list of line numbers
+            serializable_invalid_lines = []
+            for item in sorted(norm_invalid_lines):
+                if isinstance(item, datetime):
+                    serializable_invalid_lines.append(item.isoformat())
+                else:
+                    serializable_invalid_lines.append(item)
+            run.invalid_line_numbers = _dumps(serializable_invalid_lines)
+
+        # Check if all stages are OK or SKIPPED to mark as finished
+        self._stage_stats(run)
+        all_ok = run._stages_ok == len(Stage)
+        if all_ok:
+            run.status = Status.OK.value
             run.end_time = datetime.now(timezone.utc)
             start = ensure_aware(run.start_time)
             end = ensure_aware(run.end_time)
             run.duration_ms = int((end - start).total_seconds() * 1000)
-            # Try to update the current stage to error in stage_stats
-            stage_stats = json.loads(run.stage_stats) if run.stage_stats else {}
-            last_stage = None
-            for stage in [Stage.NORMALIZATION, Stage.GEMINI_QUERY, Stage.SAMPLING, Stage.CLASSIFICATION]:
-                if stage.value in stage_stats and stage_stats[stage.value].get('status') == Status.RUNNING.value:
-                    last_stage = stage.value
-                    break
-            if last_stage:
-                self._update_stage(run, last_stage, Status.ERROR, error_message=str(e), db_session=db_session)
-                run.error_message = f"{last_stage}: {str(e)}"
-                if last_stage == Stage.CLASSIFICATION.value:
-                    not_tabular_path = Path(settings.NOT_TABULAR_DIR) / filename
-                    shutil.move(str(file_path), str(not_tabular_path))
-            else:
-                run.error_message = f"Unknown: {str(e)}"
-            db_session.commit()
-            if run.status == Status.ERROR.value:
-                logger.error(f"Pipeline processing for {filename} ended with ERRORS (run ID: {run.id}). Check the log file for details.")
-            return run.id
-        finally:
-            # Remove and close the file handler to prevent log mixing between files
+            run.error_message = "success"
+            self._flush(run, db_session)
+            
+            # Calculate detailed processing statistics
+            original_input_lines = run.original_row_count or 0
+            original_non_empty_lines = input_processed_rows
+            invalid_lines_count = len(norm_invalid_lines) if norm_invalid_lines else 0
+            normalized_output_lines = output_written_rows
+            
+            logger.info(f"Successfully processed {filename}")
+            logger.info(f"Processing statistics for {filename}:")
+            logger.info(f"  - Original input lines: {original_input_lines}")
+            logger.info(f"  - Original non-empty lines processed: {original_non_empty_lines}")
+            logger.info(f"  - Invalid lines (blank/malformed): {invalid_lines_count}")
+            logger.info(f"  - Lines written to normalized output: {normalized_output_lines}")
+            logger.info(f"  - Valid row percentage: {run.valid_row_percentage}%")
+            logger.info(f"  - Processing duration: {run.duration_ms}ms")
+        else:
+            self._flush(run, db_session)
+            logger.error(f"Normalization not completed for {filename}, not marking as ok.")
+        return run.id
+
+    def _fail_run(self, run: PipelineRun, file_path: Path, e: Exception, db_session) -> UUID:
+        """Roll back the pending changes and mark the run, and the stage that was running, as failed."""
+        filename = file_path.name
+        db_session.rollback()
+        logger.error(f"Pipeline failed for {filename}: {str(e)}")
+        run.status = Status.ERROR.value
+        run.end_time = datetime.now(timezone.utc)
+        start = ensure_aware(run.start_time)
+        end = ensure_aware(run.end_time)
+        run.duration_ms = int((end - start).total_seconds() * 1000)
+        # Try to update the current stage to error in stage_stats
+        stage_stats = self._stage_stats(run)
+        last_stage = None
+        for stage in [Stage.NORMALIZATION, Stage.GEMINI_QUERY, Stage.SAMPLING, Stage.CLASSIFICATION]:
+            if stage.value in stage_stats and stage_stats[stage.value].get('status') == Status.RUNNING.value:
+                last_stage = stage.value
+                break
+        if last_stage:
+            self._update_stage(run, last_stage, Status.ERROR, error_message=str(e))
+            run.error_message = f"{last_stage}: {str(e)}"
+            if last_stage == Stage.CLASSIFICATION.value:
+                not_tabular_path = Path(settings.NOT_TABULAR_DIR) / filename
+                try:
+                    # Same filesystem: a rename, never a copy
+                    os.replace(file_path, not_tabular_path)
+                except OSError as move_error:
+                    if move_error.errno != errno.EXDEV:
+                        raise
+                    shutil.move(file_path, not_tabular_path)
+        else:
+            run.error_message = f"Unknown: {str(e)}"
+        self._flush(run, db_session)
+        if run.status == Status.ERROR.value:
+            logger.error(f"Pipeline processing for {filename} ended with ERRORS (run ID: {run.id}). Check the log file for details.")
+        return run.id
+
+    def _load_known_headers(self) -> MappingProxyType:
+        """Load known_headers.json as a read-only mapping shared by every automatic classification."""
+        known_headers_path = Path(__file__).parent / "known_headers.json"
+        try:
+            with open(known_headers_path, 'r', encoding='utf-8') as f:
+                return MappingProxyType(json.load(f))
+        except Exception as e:
+            logger.warning(f"Could not load known_headers.json: {e}")
+            return MappingProxyType({})
+
+    def _stage_stats(self, run: PipelineRun) -> dict:
+        """
+        Return the stage_stats dict cached on the run, parsing run.stage_stats the first time.
+        Parsing also counts the finished stages into run._stages_ok, which _update_stage keeps current.
+        """
+        if run._stage_stats_cache is None:
             try:
-                root_logger = logging.getLogger()
-                if 'file_handler' in locals() and file_handler in root_logger.handlers:
-                    root_logger.removeHandler(file_handler)
-                    file_handler.close()
+                run._stage_stats_cache = orjson.loads(run.stage_stats) if run.stage_stats else {}
             except Exception:
-                pass
-            if close_session:
-                db_session.close()
-        
-    def _update_stage(self, run: PipelineRun, stage: Stage | str, status: Status | str, warning: str = None, error_message: str = None, db_session=None):
-        """Update the current stage and its status, including per-stage timestamps and stats."""
-        close_session = False
-        if db_session is None:
-            db_session = self.db_session_factory()
-            close_session = True
+                run._stage_stats_cache = {}
+            run._stages_ok = sum(
+                1 for stage in Stage
+                if run._stage_stats_cache.get(stage.value, {}).get('status') in DONE_STATUSES
+            )
+        return run._stage_stats_cache
 
+    def _flush(self, run: PipelineRun, db_session):
+        """Checkpoint: serialize the cached stage_stats into the run and commit all pending changes."""
+        if run._stage_stats_cache is not None:
+            run.stage_stats = _dumps(run._stage_stats_cache)
+        db_session.commit()
+
+    def _update_stage(self, run: PipelineRun, stage: Stage | str, status: Status | str, warning: str = None, error_message: str = None):
+        """
+        Update the current stage and its status, including per-stage timestamps and stats.
+        Changes are kept in memory until the next _flush.
+        """
         stage_value = stage.value if isinstance(stage, Enum) else stage
         status_value = status.value if isinstance(status, Enum) else status
         now = datetime.now(timezone.utc)
-        # Load or initialize stage_stats
-        if not run.stage_stats:
-            stage_stats = {}
-        else:
-            try:
-                stage_stats = json.loads(run.stage_stats)
-            except Exception:
-                stage_stats = {}
+        stage_stats = self._stage_stats(run)
         # Ensure entry for this stage
         if stage_value not in stage_stats:
             stage_stats[stage_value] = {
@@ -342,6 +597,8 @@ class PipelineOrchestrator:
                 'error_message': None
             }
         entry = stage_stats[stage_value]
+        # Keep the count of finished stages in step with the status change
+        run._stages_ok += (status_value in DONE_STATUSES) - (entry['status'] in DONE_STATUSES)
         # Set start/end times and status
         if status_value == Status.RUNNING.value and not entry['start_time']:
             entry['start_time'] = now.isoformat()
@@ -356,20 +613,17 @@ class PipelineOrchestrator:
         # Set error_message if provided
         if error_message:
             entry['error_message'] = error_message
-        # Save back to run
-        stage_stats[stage_value] = entry
-        run.stage_stats = json.dumps(stage_stats)
         # Also update legacy fields for compatibility
         # Set start_time if this is the first running stage
         if status_value == Status.RUNNING.value and not run.start_time:
             run.start_time = now
         logger.info(f"Pipeline stage {stage_value}: {status_value}")
-        db_session.commit()
-        if close_session:
-            db_session.close()
         
-    def _setup_logging(self, log_file: Path):
-        """Setup file logging for this pipeline run. Ensure logs go to both file and stdout, and both outputs are identical."""
+    def _setup_logging(self, log_file: Path) -> QueueListener:
+        """
+        Setup file logging for this pipeline run. Ensure logs go to both file and stdout, and both outputs are identical.
+        The root logger only enqueues records; the returned listener writes them from its own thread.
+        """
         # Remove all existing handlers to avoid duplicates or conflicts
         root_logger = logging.getLogger()
         for handler in list(root_logger.handlers):
@@ -381,7 +635,6 @@ class PipelineOrchestrator:
         file_handler = logging.FileHandler(log_file)
         file_handler.setFormatter(formatter)
         file_handler.setLevel(logging.DEBUG)
-        root_logger.addHandler(file_handler)
         
         # Stream handler (console) with UTF-8 encoding
         import sys
@@ -394,9 +647,37 @@ class PipelineOrchestrator:
                 stream_handler.stream.reconfigure(encoding='utf-8', errors='replace')
             except Exception:
                 pass
-        root_logger.addHandler(stream_handler)
+        
+        log_queue = queue.SimpleQueue()
+        root_logger.addHandler(QueueHandler(log_queue))
+        listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+        listener.start()
         
         # Set root logger level
         root_logger.setLevel(logging.DEBUG)
         
+        return listener
+
+    def _teardown_logging(self, listener: QueueListener):
+        """Stop the run's log listener once its queue is drained; logging to stdout goes on without the queue."""
+        root_logger = logging.getLogger()
+        for handler in list(root_logger.handlers):
+            if isinstance(handler, QueueHandler) and handler.queue is listener.queue:
+                root_logger.removeHandler(handler)
+        listener.stop()
+        for handler in listener.handlers:
+            if isinstance(handler, logging.FileHandler):
+                handler.close()
+            else:
+                root_logger.addHandler(handler)
+
+    def _add_run_log_handler(self, log_file: Path, run_id: str) -> logging.Handler:
+        """Add a file handler for one run of run_pipeline, next to the handlers already installed."""
+        root_logger = logging.getLogger()
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.addFilter(_RunLogFilter(run_id))
+        root_logger.addHandler(file_handler)
+        root_logger.setLevel(logging.DEBUG)
         return file_handler
\ No newline at end of file
@@ -10,10 +10,13 @@ from .tabular_utils import read_excel_file
 
 logger = logging.getLogger(__name__)
 
-def extract_sample(file_path: str | Path, encoding: str = None) -> Tuple[List[List[str]], str, list]:
+SAMPLE_READ_BUFFER = 1 << 20  # 1 MiB reads instead of the default 8 KiB
+
+def extract_sample(file_path: str | Path, encoding: str = None, dataframe=None) -> Tuple[List[List[str]], str, list]:
     """
     Extracts up to a maximum of 1000 rows from a file to create a sample.
     The final token-based sampling is now handled in the gemini_query module.
+    dataframe is the Excel sheet when the classifier already read it, so it is not read again.
     Returns (sampled_rows, error_message, warnings)
     """
     import os
@@ -25,31 +28,33 @@ def extract_sample(file_path: str | Path, encoding: str = None) -> Tuple[List[Li
     warnings = []
     try:
         if file_path_str.lower().endswith(text_exts):
-            # Read up to MAX_LINES robustly, skip lines that can't be parsed
-            lines = []
-            with open(file_path, 'r', encoding=encoding or 'utf-8', errors='replace') as f:
-                for i, line in enumerate(f):
-                    if i >= MAX_LINES + 1:
+            # Parse up to MAX_LINES rows with a single reader, skipping rows that can't be parsed
+            data = []
+            with open(file_path, 'r', encoding=encoding or 'utf-8', errors='replace', newline='', buffering=SAMPLE_READ_BUFFER) as f:
+                reader = csv.reader(f)
+                while len(data) < MAX_LINES:
+                    try:
+                        row = next(reader)
+                    except StopIteration:
                         break
-                    lines.append(line.rstrip('\n'))
+                    except csv.Error as e:
+                        warning_msg = f"[SAMPLER] Failed to parse line {reader.line_num} ({e})"
+                        logger.warning(warning_msg)
+                        warnings.append(warning_msg)
+                        continue  # skip lines that can't be parsed
+                    # A blank line parses as [] and was never part of the sample; it does not count toward MAX_LINES
+                    if row:
+                        data.append(row)
 
-            # Use csv.reader for robust splitting (handles quoted fields)
-            data = []
-            for line in lines:
-                try:
-                    row = next(csv.reader([line]))
-                    data.append(row)
-                except Exception as e:
-                    warning_msg = f"[SAMPLER] Failed to parse line: {line[:50]}... ({e})"
-                    logger.warning(warning_msg)
-                    warnings.append(warning_msg)
-                    continue  # skip lines that can't be parsed
-            
             logger.info(f"Extracted {len(data)} lines from {file_name} for sampling.")
             return data, "", warnings
 
         elif file_path_str.lower().endswith(excel_exts):
-            df = read_excel_file(file_path, encoding=encoding)
+            if dataframe is not None:
+                df = dataframe
+            else:
+                # One row more than the limit tells whether the sheet had to be truncated
+                df = read_excel_file(file_path, encoding=encoding, nrows=MAX_LINES + 1)
             # Limit to MAX_LINES
             if len(df) > MAX_LINES:
                 df = df.head(MAX_LINES)
@@ -2,13 +2,14 @@ import pandas as pd
 from pathlib import Path
 
 
-def read_excel_file(file_path: str | Path, encoding: str = None):
+def read_excel_file(file_path: str | Path, encoding: str = None, nrows: int | None = None):
     """
     Reads an Excel file (.xls, .xlsx, .ods) and returns a pandas DataFrame.
     Empty cells are read as empty strings instead of NaN.
     Args:
         file_path: Path to the file
         encoding: Encoding to use for reading the file (optional, only for .xls)
+        nrows: Maximum number of data rows to read (optional, default all)
     Returns:
         pd.DataFrame: The loaded data
     Raises:
@@ -20,8 +21,8 @@ def read_excel_file(file_path: str | Path, encoding: str = None):
         import pandas as pd
         # pandas.read_excel uses encoding only for .xls files, not .xlsx
         if file_path.lower().endswith('.xls') and encoding:
-            return pd.read_excel(file_path, encoding=encoding, dtype=str, keep_default_na=False)
+            return pd.read_excel(file_path, encoding=encoding, dtype=str, keep_default_na=False, nrows=nrows)
         else:
-            return pd.read_excel(file_path, dtype=str, keep_default_na=False)
+            return pd.read_excel(file_path, dtype=str, keep_default_na=False, nrows=nrows)
     else:
         raise ValueError("Unsupported file type (by extension): {}. Only .xls, .xlsx, .ods are supported for Excel reading.".format(file_path)) 
\ No newline at end of file
@@ -4,6 +4,15 @@ File Watcher module for monitoring the input directory for new CSV files.
 import time
 from pathlib import Path
 import logging
+import errno
+import io
+import mmap
+import os
+import queue
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import exists, insert, literal, select
 from watchdog.observers.polling import PollingObserver as Observer
 from watchdog.events import FileSystemEventHandler
 from .orchestrator import PipelineOrchestrator
@@ -12,6 +21,7 @@ from ..models.pipeline_run import PipelineRun, init_db
 from .orchestrator import Status
 import tarfile
 import gzip
+import zipfile
 
 try:
     import py7zr
@@ -24,77 +34,256 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-def extract_archive_recursive(file_path, extract_dir, depth=0, max_depth=3, logger=None):
+EXTRACT_WORKERS = os.cpu_count() or 1
+EVENT_WORKERS = 4
+ENQUEUE_BATCH = 64  # max extracted files enqueued per transaction
+SUPPORTED_EXTS = frozenset({'.csv', '.tsv', '.psv', '.dat', '.data', '.txt', '.xls', '.xlsx', '.ods'})
+ARCHIVE_EXTS = frozenset({'.zip', '.7z', '.tar', '.gz', '.tgz', '.tar.gz', '.rar'})
+_TAR_GZ_SUFFIXES = ('.tar.gz', '.tgz')
+EVENT_DEBOUNCE = 0.1  # seconds; repeated events for a path within this window are handled once
+COPY_BUFFER = 1 << 20
+STAGING_DIRNAME = '.staging'  # archives are extracted under INPUT_DIR/.staging, on the inbound filesystem
+MMAP_THRESHOLD = 64 << 20  # archives at least this big are read through mmap
+
+def _file_ext(path):
+    """Lowercased extension of path, with .tar.gz and .tgz both reported as '.tar.gz'."""
+    return '.tar.gz' if path.name.endswith(_TAR_GZ_SUFFIXES) else path.suffix.lower()
+
+class _MappedFile(mmap.mmap):
+    """Read-only mapping usable as a file object by zipfile, which checks seekable() (mmap lacks it before 3.13)."""
+
+    def seekable(self):
+        return True
+
+def _safe(name):
+    """
+    True when the archive member name stays inside the extraction dir. A string check on the
+    normalized name: no resolve() syscalls per member.
+    """
+    n = os.path.normpath(name)
+    return not (os.path.isabs(n) or n == '..' or n.startswith('..' + os.sep))
+
+def _open_source(file_path):
+    """
+    Open an archive for reading: memory-mapped from MMAP_THRESHOLD up, so reads come straight
+    from the page cache, and as a buffered file below it, where the mapping setup is not worth it.
+    """
+    f = open(file_path, 'rb', buffering=COPY_BUFFER)
+    if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+        return f
+    with f:
+        return _MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+_copy_local = threading.local()
+
+def _copy(src, dst):
+    """Copy src to dst through a reusable COPY_BUFFER-sized buffer, one per thread."""
+    buf = getattr(_copy_local, 'buf', None)
+    if buf is None:
+        buf = _copy_local.buf = memoryview(bytearray(COPY_BUFFER))
+    while n := src.readinto(buf):
+        dst.write(buf[:n])
+
+def _extract_parallel(open_archive, tasks, extract, landed):
+    """
+    Run extract(handle, task) for each task on a thread pool and pass every file it returns to
+    landed as soon as the task completes. Archive objects are not thread-safe, so each worker
+    thread opens its own handle with open_archive. A failing task (corrupt member, CRC error) is
+    logged and skipped; the other tasks still run and their files are still handed over.
+    """
+    local = threading.local()
+    handles = []
+
+    def work(task):
+        handle = getattr(local, 'handle', None)
+        if handle is None:
+            handle = local.handle = open_archive()
+            handles.append(handle)
+        return extract(handle, task)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(EXTRACT_WORKERS, len(tasks)))) as pool:
+            futures = {pool.submit(work, task): task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    extracted = future.result()
+                except Exception as e:
+                    task = futures[future]
+                    logger.error(f"Error extracting {getattr(task, 'filename', task)}: {e}")
+                    continue
+                for ef in extracted:
+                    landed(ef)
+    finally:
+        for handle in handles:
+            handle.close()
+
+def _make_parents(extract_dir, names):
+    """
+    Create the parent dirs of every member up front, from one thread: concurrent extract() calls
+    race between their exists() check and makedirs() on a shared parent and fail with EEXIST.
+    """
+    for parent in {(extract_dir / name).parent for name in names}:
+        parent.mkdir(parents=True, exist_ok=True)
+
+def _zip_extract(zf, info, extract_dir):
+    return [Path(zf.extract(info, extract_dir))]
+
+def _7z_extract(z, names, extract_dir):
+    z.extract(path=extract_dir, targets=names)
+    z.reset()
+    return [extract_dir / name for name in names]
+
+def _rar_extract(rf, info, extract_dir):
+    return [Path(rf.extract(info, extract_dir))]
+
+def _extract_zip(file_path, extract_dir, safe, landed):
+    """Extract zip members in parallel, one ZipFile handle per worker thread."""
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        infos = [info for info in zip_ref.infolist() if not info.is_dir() and safe(info.filename)]
+    _make_parents(extract_dir, [info.filename for info in infos])
+    # One source per worker handle: mmap and file positions are not shared between threads
+    sources = []
+
+    def open_zip():
+        source = _open_source(file_path)
+        sources.append(source)
+        return zipfile.ZipFile(source, 'r')
+
+    try:
+        _extract_parallel(open_zip, infos, lambda zf, info: _zip_extract(zf, info, extract_dir), landed)
+    finally:
+        for source in sources:
+            source.close()
+
+def _extract_7z(file_path, extract_dir, safe, landed):
+    """Extract a 7z archive: in one pass if solid, otherwise in parallel name partitions."""
+    with py7zr.SevenZipFile(file_path, mode='r') as z:
+        names = [f.filename for f in z.list() if not f.is_directory and safe(f.filename)]
+        solid = z.archiveinfo().solid
+        if solid:
+            # A solid archive is one compressed stream, so split reads would decompress it repeatedly
+            z.extract(path=extract_dir, targets=names)
+    if solid:
+        # Member names come from the archive listing, not a walk of extract_dir
+        for name in names:
+            ef = extract_dir / name
+            if ef.is_file():
+                landed(ef)
+    else:
+        # Disjoint name partitions, one per worker
+        _make_parents(extract_dir, names)
+        parts = [names[i::EXTRACT_WORKERS] for i in range(EXTRACT_WORKERS) if names[i::EXTRACT_WORKERS]]
+        _extract_parallel(lambda: py7zr.SevenZipFile(file_path, mode='r'), parts,
+                          lambda z, part: _7z_extract(z, part, extract_dir), landed)
+
+def _extract_rar(file_path, extract_dir, safe, landed):
+    """Extract a rar archive: in one unrar call if solid, otherwise member by member in parallel."""
+    with rarfile.RarFile(file_path) as rf:
+        solid = rf.is_solid()
+        if solid:
+            # Extracted in one go: unrar would re-read a solid stream for every member. unrar
+            # itself refuses to write outside extract_dir
+            rf.extractall(extract_dir)
+            names = [name for name in rf.namelist() if safe(name)]
+        else:
+            infos = [info for info in rf.infolist() if info.is_file() and safe(info.filename)]
+    if solid:
+        for name in names:
+            ef = extract_dir / name
+            if ef.is_file():
+                landed(ef)
+    else:
+        _make_parents(extract_dir, [info.filename for info in infos])
+        _extract_parallel(lambda: rarfile.RarFile(file_path), infos,
+                          lambda rf, info: _rar_extract(rf, info, extract_dir), landed)
+
+def _extract_tar(file_path, extract_dir, safe, landed):
+    """Extract a (possibly compressed) tar in stream mode: one forward pass, no seeking back."""
+    with _open_source(file_path) as raw, tarfile.open(fileobj=raw, mode='r|*') as tar:
+        for member in tar:
+            if member.isfile() and safe(member.name):
+                ef = extract_dir / member.name
+                ef.parent.mkdir(parents=True, exist_ok=True)
+                with tar.extractfile(member) as f_in, open(ef, 'wb') as f_out:
+                    _copy(f_in, f_out)
+                landed(ef)
+
+def _extract_gz(file_path, extract_dir, safe, landed):
+    """Decompress a single-file .gz into extract_dir, under its name without the .gz suffix."""
+    out_path = extract_dir / file_path.stem
+    # Copied in bounded chunks so memory does not grow with the decompressed size
+    with io.BufferedReader(gzip.open(file_path, 'rb'), buffer_size=COPY_BUFFER) as f_in, \
+            open(out_path, 'wb') as f_out:
+        _copy(f_in, f_out)
+    landed(out_path)
+
+# Extractor per normalized extension; 7z and rar only when their library is installed
+_EXTRACTORS = {'.zip': _extract_zip, '.tar': _extract_tar, '.tar.gz': _extract_tar, '.gz': _extract_gz}
+if py7zr:
+    _EXTRACTORS['.7z'] = _extract_7z
+if rarfile:
+    _EXTRACTORS['.rar'] = _extract_rar
+
+def extract_archive_recursive(file_path, extract_dir, depth=0, max_depth=3, logger=None, on_file=None):
     """
     Recursively extract supported archives up to max_depth. Returns a list of extracted files.
+    Zip, and non-solid 7z and rar, members are extracted in parallel and tar members one at a
+    time; on_file (if given) is called with each extracted file as soon as it is on disk, so
+    callers can start handling it during extraction.
     """
-    supported_archives = {'.zip', '.7z', '.tar', '.gz', '.tgz', '.tar.gz', '.rar'}
-    extracted_files = []
+    all_files = []
     if depth > max_depth:
         if logger:
             logger.warning(f"Max extraction depth {max_depth} reached for {file_path}")
         return []
-    ext = file_path.suffix.lower()
-    # Handle .tar.gz and .tgz
-    if file_path.name.endswith('.tar.gz') or file_path.name.endswith('.tgz'):
-        ext = '.tar.gz'
-    if ext not in supported_archives:
+    ext = _file_ext(file_path)
+    if ext not in ARCHIVE_EXTS:
         return [file_path]
-    try:
-        if ext == '.zip':
-            import zipfile
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
-                for name in zip_ref.namelist():
-                    ef = extract_dir / name
-                    if ef.is_file():
-                        extracted_files.append(ef)
-        elif ext == '.7z' and py7zr:
-            with py7zr.SevenZipFile(file_path, mode='r') as z:
-                z.extractall(path=extract_dir)
-                for ef in extract_dir.rglob('*'):
-                    if ef.is_file():
-                        extracted_files.append(ef)
-        elif ext == '.rar' and rarfile:
-            with rarfile.RarFile(file_path) as rf:
-                rf.extractall(extract_dir)
-                for name in rf.namelist():
-                    ef = extract_dir / name
-                    if ef.is_file():
-                        extracted_files.append(ef)
-        elif ext in {'.tar', '.tar.gz'}:
-            with tarfile.open(file_path, 'r:*') as tar:
-                tar.extractall(extract_dir)
-                for member in tar.getmembers():
-                    ef = extract_dir / member.name
-                    if ef.is_file():
-                        extracted_files.append(ef)
-        elif ext == '.gz' and not file_path.name.endswith('.tar.gz'):
-            # .gz (single file)
-            out_path = extract_dir / file_path.stem
-            with gzip.open(file_path, 'rb') as f_in, open(out_path, 'wb') as f_out:
-                f_out.write(f_in.read())
-            extracted_files.append(out_path)
+
+    def safe(name):
+        """Check a member name with _safe, logging the members that are skipped."""
+        if _safe(name):
+            return True
+        if logger:
+            logger.warning(f"Skipped unsafe path {name!r} in {file_path}")
+        return False
+
+    def landed(ef):
+        """Recurse into an extracted archive, or hand over an extracted file."""
+        if _file_ext(ef) in ARCHIVE_EXTS:
+            sub_extract_dir = ef.parent / f"extracted_{ef.stem}"
+            sub_extract_dir.mkdir(exist_ok=True)
+            all_files.extend(extract_archive_recursive(ef, sub_extract_dir, depth+1, max_depth, logger, on_file))
         else:
+            all_files.append(ef)
+            if on_file:
+                on_file(ef)
+
+    try:
+        extract = _EXTRACTORS.get(ext)
+        if extract is None:
             # Not supported or not installed
             if logger:
                 logger.warning(f"Archive type {ext} not supported or required library not installed.")
             return []
+        extract(file_path, extract_dir, safe, landed)
     except Exception as e:
+        # Members handed over before the error stay extracted
         if logger:
             logger.error(f"Error extracting {file_path}: {e}")
-        return []
-    # Recursively extract any archives found inside
-    all_files = []
-    for ef in extracted_files:
-        if ef.suffix.lower() in supported_archives or ef.name.endswith('.tar.gz') or ef.name.endswith('.tgz'):
-            sub_extract_dir = ef.parent / f"extracted_{ef.stem}"
-            sub_extract_dir.mkdir(exist_ok=True)
-            all_files.extend(extract_archive_recursive(ef, sub_extract_dir, depth+1, max_depth, logger))
-        else:
-            all_files.append(ef)
     return all_files
 
+def _enqueue_stmt(filename, priority):
+    """
+    INSERT an ENQUEUED run for filename unless a run with that filename already exists, as one
+    statement (rowcount is 0 when it did). filename is not unique (reprocessing adds runs for the
+    same file), so this is INSERT ... SELECT WHERE NOT EXISTS rather than ON CONFLICT.
+    """
+    return insert(PipelineRun).from_select(
+        ['filename', 'status', 'priority'],
+        select(literal(filename), literal(Status.ENQUEUED.value), literal(priority))
+        .where(~exists().where(PipelineRun.filename == filename)))
+
 class CSVHandler(FileSystemEventHandler):
     def __init__(self, orchestrator: PipelineOrchestrator):
         """
@@ -105,6 +294,55 @@ class CSVHandler(FileSystemEventHandler):
         """
         self.orchestrator = orchestrator
         self.processing = set()  # Track files being processed
+        # Events are handled off the observer thread: paths go on a queue drained by worker threads
+        self._events = queue.Queue()
+        self._deadlines = {}  # path -> time its debounce window ends
+        self._queue_lock = threading.Lock()  # guards _deadlines and processing
+        self._workers = [threading.Thread(target=self._drain, daemon=True, name=f"watcher-{i}")
+                         for i in range(EVENT_WORKERS)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, file_path):
+        """
+        Queue file_path for process_file, coalescing events for it that arrive within EVENT_DEBOUNCE.
+        Events for a path a worker is still processing are dropped, so a file is never processed
+        twice at the same time.
+        """
+        with self._queue_lock:
+            if file_path in self.processing:
+                logger.debug(f"Ignoring event for {file_path}: it is being processed")
+                return
+            queued = file_path in self._deadlines
+            self._deadlines[file_path] = time.monotonic() + EVENT_DEBOUNCE
+        if not queued:
+            self._events.put(file_path)
+
+    def _drain(self):
+        """Worker loop: wait out each queued path's debounce window, then process it."""
+        while (file_path := self._events.get()) is not None:
+            while True:
+                with self._queue_lock:
+                    wait = self._deadlines[file_path] - time.monotonic()
+                    if wait <= 0:
+                        del self._deadlines[file_path]
+                        self.processing.add(file_path)
+                        break
+                time.sleep(wait)
+            try:
+                self.process_file(file_path)
+            except Exception as e:
+                logger.error(f"Error processing {file_path}: {e}")
+            finally:
+                with self._queue_lock:
+                    self.processing.discard(file_path)
+
+    def close(self):
+        """Stop the worker threads once the events already queued are handled."""
+        for _ in self._workers:
+            self._events.put(None)
+        for worker in self._workers:
+            worker.join()
     
     def process_file(self, file_path):
         """
@@ -119,119 +357,161 @@ class CSVHandler(FileSystemEventHandler):
         # Small delay to avoid permission issues while OS is moving/writing the file
         time.sleep(0.5)
             
-        ext = file_path.suffix.lower()
-        supported_exts = {'.csv', '.tsv', '.psv', '.dat', '.data', '.txt', '.xls', '.xlsx', '.ods'}
-        archive_exts = {'.zip', '.7z', '.tar', '.gz', '.tgz', '.tar.gz', '.rar'}
+        ext = _file_ext(file_path)
         
-        if ext in supported_exts:
-            # Check for priority metadata file
-            priority = 3  # Default priority
-            priority_file = file_path.parent / (file_path.name + ".priority")
-            if priority_file.exists():
-                try:
-                    with open(priority_file, 'r') as f:
-                        priority = int(f.read().strip())
-                    # Clean up priority file
-                    priority_file.unlink()
-                    logger.info(f"Found priority {priority} for file {file_path.name}")
-                except Exception as e:
-                    logger.warning(f"Error reading priority file for {file_path.name}: {e}, using default priority 3")
-                    priority = 3
-            
-            # ENQUEUE: Create PipelineRun if not exists
-            db = self.orchestrator.db_session_factory()
-            try:
-                existing = db.query(PipelineRun).filter_by(filename=file_path.name).first()
-                if not existing:
-                    run = PipelineRun(filename=file_path.name, status=Status.ENQUEUED.value, priority=priority)
-                    db.add(run)
-                    db.commit()
-                    logger.info(f"Enqueued file: {file_path} with priority {priority}")
-                else:
-                    logger.info(f"File {file_path.name} already exists in database, skipping")
-            except Exception as e:
-                logger.error(f"Database error while enqueueing {file_path.name}: {e}")
-                db.rollback()
-            finally:
-                db.close()
+        if ext in SUPPORTED_EXTS:
+            self._enqueue_file(file_path)
             return
             
         # Handle archives (recursive, multi-format)
-        if ext in archive_exts:
-            logger.info(f"Archive detected: {file_path}. Extracting...")
-            extract_dir = file_path.parent / f"extracted_{file_path.stem}"
-            extract_dir.mkdir(exist_ok=True)
-            extracted_files = extract_archive_recursive(file_path, extract_dir, logger=logger)
-            for ef in extracted_files:
-                ef_ext = ef.suffix.lower()
-                if ef_ext in archive_exts or ef.name.endswith('.tar.gz') or ef.name.endswith('.tgz'):
-                    logger.info(f"Skipped nested archive: {ef}")
-                    continue
-                inbound_dir = Path(settings.INPUT_DIR).resolve()
-                ef_abs = ef.resolve()
-                dest_path = inbound_dir / ef_abs.name
-                if dest_path.exists():
-                    logger.warning(f"File {dest_path} already exists in inbound dir. Skipping move of {ef_abs}.")
-                    continue
-                try:
-                    ef_abs.replace(dest_path)
-                    logger.info(f"Moved extracted file {ef_abs} to inbound dir as {dest_path}")
-                except Exception as e:
-                    logger.error(f"Failed to move {ef_abs} to {dest_path}: {e}")
-                    continue
-                # Check for priority metadata file for extracted file
-                priority = 3  # Default priority for extracted files
-                compressed_priority_file = inbound_dir / (file_path.name+".priority")
-                logger.debug(f"Checking for priority file: {compressed_priority_file}")
-                if compressed_priority_file.exists():
-                    logger.debug(f"Found priority file: {compressed_priority_file}")
-                    try:
-                        with open(compressed_priority_file, 'r') as f:
-                            priority = int(f.read().strip())
-                    except Exception as e:
-                        logger.warning(f"Error reading priority file for {compressed_priority_file}: {e}, using default priority 3")
-                        priority = 3
-
-
-                extracted_priority_file = inbound_dir / (ef_abs.name + ".priority")
-                with open(extracted_priority_file, "w") as f:
-                    f.write(str(priority))
-                    logger.info(f"Created priority file {extracted_priority_file} with priority {priority}")
-
-                db = self.orchestrator.db_session_factory()
-                try:
-                    existing = db.query(PipelineRun).filter_by(filename=dest_path.name).first()
-                    if not existing:
-                        run = PipelineRun(filename=dest_path.name, status=Status.ENQUEUED.value, priority=priority)
-                        db.add(run)
-                        db.commit()
-                        logger.info(f"Enqueued extracted file: {dest_path.name} with priority {priority}")
-                    else:
-                        logger.info(f"Extracted file {dest_path.name} already exists in database, skipping")
-                except Exception as e:
-                    logger.error(f"Database error while enqueueing extracted file {dest_path.name}: {e}")
-                    db.rollback()
-                finally:
-                    db.close()
-            # Clean up extracted subdirectory
-            try:
-                import shutil
-                shutil.rmtree(extract_dir)
-                logger.info(f"Cleaned up extracted directory {extract_dir}")
-            except Exception as e:
-                logger.warning(f"Failed to clean up extracted directory {extract_dir}: {e}")
-            logger.info(f"Finished extracting and enqueuing files from archive: {file_path}")
+        if ext in ARCHIVE_EXTS:
+            self._handle_archive(file_path)
             return
             
         # Unsupported extension
         logger.error(f"Unsupported file extension for {file_path}. Only .csv, .txt, .zip, .7z, .tar, .gz, .tgz, .tar.gz, and .rar are supported.")
         
+    def _enqueue_file(self, file_path):
+        """Enqueue a tabular file with the priority from its .priority file (default 3)."""
+        # Check for priority metadata file
+        priority = 3  # Default priority
+        priority_file = file_path.parent / (file_path.name + ".priority")
+        if priority_file.exists():
+            try:
+                with open(priority_file, 'r') as f:
+                    priority = int(f.read().strip())
+                # Clean up priority file
+                priority_file.unlink()
+                logger.info(f"Found priority {priority} for file {file_path.name}")
+            except Exception as e:
+                logger.warning(f"Error reading priority file for {file_path.name}: {e}, using default priority 3")
+                priority = 3
+        
+        # ENQUEUE: Create PipelineRun if not exists
+        db = self.orchestrator.db_session_factory()
+        try:
+            inserted = db.execute(_enqueue_stmt(file_path.name, priority)).rowcount
+            db.commit()
+            if inserted:
+                logger.info(f"Enqueued file: {file_path} with priority {priority}")
+            else:
+                logger.info(f"File {file_path.name} already exists in database, skipping")
+        except Exception as e:
+            logger.error(f"Database error while enqueueing {file_path.name}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _handle_archive(self, file_path):
+        """Extract an archive, move its files into the inbound dir and enqueue them."""
+        logger.info(f"Archive detected: {file_path}. Extracting...")
+        inbound_dir = Path(settings.INPUT_DIR).resolve()
+        # Staged inside the inbound dir so moving a member there is a rename, not a copy
+        extract_dir = inbound_dir / STAGING_DIRNAME / f"extracted_{file_path.name}"
+        extract_dir.mkdir(parents=True, exist_ok=True)
+        # Each extracted file is moved as soon as it is on disk and enqueued in batches by a
+        # consumer thread, so decompression carries on while a batch commits
+        moved = queue.Queue(maxsize=ENQUEUE_BATCH)
+        consumer = threading.Thread(target=self._consume_moved, args=(moved,), daemon=True)
+        consumer.start()
+        try:
+            extract_archive_recursive(file_path, extract_dir, logger=logger,
+                                      on_file=lambda ef: self._move_extracted(ef, file_path, inbound_dir, moved))
+        finally:
+            moved.put(None)
+            consumer.join()
+        # Clean up what was not moved out (skipped duplicates, nested archives past max_depth)
+        try:
+            shutil.rmtree(extract_dir)
+            logger.info(f"Cleaned up extracted directory {extract_dir}")
+        except Exception as e:
+            logger.warning(f"Failed to clean up extracted directory {extract_dir}: {e}")
+        logger.info(f"Finished extracting and enqueuing files from archive: {file_path}")
+
+    def _move_extracted(self, ef, archive_path, inbound_dir, moved):
+        """
+        Move a file extracted from archive_path into inbound_dir, give it the archive's priority
+        and put (filename, priority) on the moved queue for _consume_moved.
+        """
+        dest_path = inbound_dir / ef.name
+        if dest_path.exists():
+            logger.warning(f"File {dest_path} already exists in inbound dir. Skipping move of {ef}.")
+            return
+        try:
+            try:
+                # The staging dir is inside inbound_dir: a rename, never a copy
+                os.replace(ef, dest_path)
+            except OSError as move_error:
+                # Only if the staging dir is a mount point of its own
+                if move_error.errno != errno.EXDEV:
+                    raise
+                shutil.move(ef, dest_path)
+            logger.info(f"Moved extracted file {ef} to inbound dir as {dest_path}")
+        except Exception as e:
+            logger.error(f"Failed to move {ef} to {dest_path}: {e}")
+            return
+        # Check for priority metadata file for extracted file
+        priority = 3  # Default priority for extracted files
+        compressed_priority_file = inbound_dir / (archive_path.name+".priority")
+        logger.debug(f"Checking for priority file: {compressed_priority_file}")
+        if compressed_priority_file.exists():
+            logger.debug(f"Found priority file: {compressed_priority_file}")
+            try:
+                with open(compressed_priority_file, 'r') as f:
+                    priority = int(f.read().strip())
+            except Exception as e:
+                logger.warning(f"Error reading priority file for {compressed_priority_file}: {e}, using default priority 3")
+                priority = 3
+
+
+        extracted_priority_file = inbound_dir / (ef.name + ".priority")
+        with open(extracted_priority_file, "w") as f:
+            f.write(str(priority))
+            logger.info(f"Created priority file {extracted_priority_file} with priority {priority}")
+
+        moved.put((dest_path.name, priority))
+
+    def _consume_moved(self, moved):
+        """Enqueue (filename, priority) pairs from the moved queue, up to ENQUEUE_BATCH per transaction, until None."""
+        while True:
+            item = moved.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) == ENQUEUE_BATCH:
+                    break
+                try:
+                    item = moved.get_nowait()
+                except queue.Empty:
+                    break
+            self._enqueue_extracted(batch)
+            if item is None:
+                return
+
+    def _enqueue_extracted(self, pending):
+        """Enqueue a batch of (filename, priority) pairs moved out of an archive in a single transaction."""
+        if not pending:
+            return
+        db = self.orchestrator.db_session_factory()
+        try:
+            for name, priority in pending:
+                if db.execute(_enqueue_stmt(name, priority)).rowcount:
+                    logger.info(f"Enqueued extracted file: {name} with priority {priority}")
+                else:
+                    logger.info(f"Extracted file {name} already exists in database, skipping")
+            db.commit()
+        except Exception as e:
+            logger.error(f"Database error while enqueueing {len(pending)} extracted files: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
     def on_created(self, event):
         """Handle file creation events."""
         if event.is_directory:
             return
         file_path = Path(event.src_path)
-        self.process_file(file_path)
+        self.submit(file_path)
 
     def on_moved(self, event):
         """Handle file moved/renamed events (e.g., .uploading -> .csv, .zip, .7z, etc.)."""
@@ -241,7 +521,7 @@ class CSVHandler(FileSystemEventHandler):
         dest_path = Path(event.dest_path)
         if src_path.name.endswith('.uploading') and not dest_path.name.endswith('.uploading'):
             logger.info(f"Upload finished: {dest_path.name}")
-        self.process_file(dest_path)
+        self.submit(dest_path)
 
 class FileWatcher:
     def __init__(self, orchestrator: PipelineOrchestrator):
@@ -253,6 +533,7 @@ class FileWatcher:
         """
         self.orchestrator = orchestrator
         self.observer = Observer()
+        self.handler = None
         
     def start(self):
         """Start watching the input directory."""
@@ -260,7 +541,7 @@ class FileWatcher:
             input_path = Path(settings.INPUT_DIR)
             input_path.mkdir(parents=True, exist_ok=True)
             
-            handler = CSVHandler(self.orchestrator)
+            handler = self.handler = CSVHandler(self.orchestrator)
             
             # Scan inicial de archivos existentes en el directorio
             logger.info(f"Performing initial scan of directory: {input_path}")
@@ -289,4 +570,7 @@ class FileWatcher:
         """Stop watching the input directory."""
         self.observer.stop()
         self.observer.join()
+        if self.handler:
+            self.handler.close()
+            self.handler = None
         logger.info("Stopped watching directory") 
\ No newline at end of file
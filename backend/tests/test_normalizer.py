@@ -0,0 +1,221 @@
+"""
+Tests for the CSV normalizer.
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("GEMINI_API_KEY", "test")  # settings require a key; the tests never call Gemini
+
+from src.config.settings import settings
+from src.pipeline.normalizer import FALLBACK_DELIMITERS, Normalizer, split_unquoted_fields
+
+
+def legacy_split_unquoted_fields(field, delimiters):
+    """Verbatim copy of the splitter nested in _split_row_by_separators before it was moved to module level."""
+    def is_quoted(s):
+        result = len(s) >= 2 and s.startswith('"') and s.endswith('"')
+        return result
+
+    fields = []
+    queue = [field]
+    while queue:
+        current = queue.pop(0)
+        if is_quoted(current):
+            fields.append(current)
+            continue
+        for delim in delimiters:
+            # Find delimiter outside quotes
+            in_quotes = False
+            for i, c in enumerate(current):
+                if c == '"':
+                    in_quotes = not in_quotes
+                if not in_quotes and current.startswith(delim, i):
+                    left = current[:i].strip()
+                    right = current[i+len(delim):].strip()
+                    queue.insert(0, right)
+                    queue.insert(0, left)
+                    break
+            else:
+                continue
+            break
+        else:
+            fields.append(current)
+    return fields
+
+
+class SplitUnquotedFieldsTest(unittest.TestCase):
+    def assertMatchesLegacy(self, field, delimiters=FALLBACK_DELIMITERS):
+        self.assertEqual(split_unquoted_fields(field, delimiters), legacy_split_unquoted_fields(field, delimiters),
+                         repr(field))
+
+    def test_matches_legacy_splitter(self):
+        for field in ['a\t,b', 'a,\tb', 'a\t\tb', '"a","b"', '"a"b,c"d"', 'a,b;c|d\te:f', ' a , b ',
+                      '"x,y",z', 'a;"b|c:d"', '"a,b', 'a,,b', 'a,b,', 'a\t', ',a', 'abc', '', ' "a,b" ',
+                      'a;b,c', '"a";"b",c', 'a, "b;c" ,d']:
+            self.assertMatchesLegacy(field)
+
+    def test_matches_legacy_splitter_on_random_fields(self):
+        rng = random.Random(3)
+        alphabet = 'ab "' + ''.join(FALLBACK_DELIMITERS)
+        for _ in range(5000):
+            self.assertMatchesLegacy(''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))))
+
+    def test_whitespace_next_to_a_tab_does_not_add_columns(self):
+        self.assertEqual(split_unquoted_fields("a\t,b"), ["a", "b"])
+        self.assertEqual(split_unquoted_fields("a\t\tb"), ["a", "b"])
+
+    def test_quoted_field_is_kept_whole(self):
+        self.assertEqual(split_unquoted_fields('"a","b"'), ['"a","b"'])
+        self.assertEqual(split_unquoted_fields('"a"b,c"d"'), ['"a"b,c"d"'])
+
+    def test_custom_delimiters(self):
+        self.assertEqual(split_unquoted_fields("a-b,c", ["-"]), ["a", "b,c"])
+        self.assertEqual(split_unquoted_fields('"a-b"-c', ["-"]), ['"a-b"', "c"])
+        self.assertMatchesLegacy("a-b;c-d", ["-", ";"])
+
+
+GEMINI_RESULT = {
+    "header_mapping": {"0": "digid_email", "1": "password", "2": "pdata_pdata_fullname"},
+    "normalization_map": {"digid_email": True},
+    "input_has_header": True,
+    "total_columns": 3,
+}
+
+
+def sample_lines(count):
+    """Mixed LF and CRLF rows with blank, short, quoted and multi-line quoted rows."""
+    rng = random.Random(7)
+    lines = [b"email,password,name\r\n"]
+    for i in range(count):
+        r = rng.random()
+        eol = b"\r\n" if rng.random() < 0.5 else b"\n"
+        if r < 0.03:
+            lines.append(eol)
+        elif r < 0.06:
+            lines.append(f"bad{i},x".encode() + eol)
+        elif r < 0.09:
+            # A quoted field spanning two physical lines
+            lines.append(f'u{i}@x.com,pw{i},"first line'.encode() + eol + b'second line"' + eol)
+        elif r < 0.12:
+            lines.append(f'U{i}@X.com,"p,w{i}","N\u00e9 {i}"'.encode() + eol)
+        else:
+            lines.append(f"u{i}@x.com,pw{i},Name {i}".encode() + eol)
+    return lines
+
+
+class ParallelNormalizationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def normalize(self, data, tag, min_mb, workers):
+        run_dir = self.tmp / tag
+        for sub in ("in", "out", "invalid", "reprocess"):
+            (run_dir / sub).mkdir(parents=True)
+        input_path = run_dir / "in" / "sample.csv"
+        input_path.write_bytes(data)
+        with mock.patch.multiple(settings, NORMALIZE_PARALLEL_MIN_MB=min_mb, NORMALIZE_WORKERS=workers,
+                                 INVALID_DIR=str(run_dir / "invalid"), REPROCESS_DIR=str(run_dir / "reprocess")):
+            normalizer = Normalizer(GEMINI_RESULT)
+            chunks = len(normalizer._plan_text_chunks(input_path, "utf-8")) - 1
+            result = normalizer.normalize_file(input_path, run_dir / "out" / "sample.csv",
+                                               run_dir / "out" / "sample.json", encoding="utf-8")
+        outputs = {str(p.relative_to(run_dir)): p.read_bytes()
+                   for p in run_dir.rglob("*") if p.is_file() and p.suffix != ".7z" and p != input_path}
+        return chunks, result, outputs
+
+    def test_parallel_output_matches_sequential(self):
+        data = b"".join(sample_lines(3000))
+        seq_chunks, seq_result, seq_outputs = self.normalize(data, "seq", 64, 1)
+        par_chunks, par_result, par_outputs = self.normalize(data, "par", 0, 5)
+        self.assertEqual(seq_chunks, 1)
+        self.assertEqual(par_chunks, 5)
+        self.assertEqual(par_result, seq_result)
+        self.assertEqual(sorted(par_outputs), sorted(seq_outputs))
+        for name, content in seq_outputs.items():
+            self.assertEqual(par_outputs[name], content, name)
+
+    def test_chunk_boundaries_fall_after_crlf_pairs(self):
+        data = b"".join(line.replace(b"\r\n", b"\n").replace(b"\n", b"\r\n") for line in sample_lines(500))
+        input_path = self.tmp / "crlf.csv"
+        input_path.write_bytes(data)
+        # Enough worker counts that some raw split targets land between a \r and its \n
+        for workers in range(2, 40):
+            with mock.patch.multiple(settings, NORMALIZE_PARALLEL_MIN_MB=0, NORMALIZE_WORKERS=workers):
+                bounds = Normalizer(GEMINI_RESULT)._plan_text_chunks(input_path, "utf-8")
+            self.assertEqual((bounds[0], bounds[-1]), (0, len(data)))
+            for bound in bounds[1:-1]:
+                self.assertEqual(data[bound - 2:bound], b"\r\n")
+        seq = self.normalize(data, "crlf_seq", 64, 1)
+        par = self.normalize(data, "crlf_par", 0, 7)
+        self.assertEqual(par[1:], seq[1:])
+
+
+def legacy_stitch_shingles(qualifying, values, threshold):
+    """Copy of Normalizer._stitch_shingles before chains were walked from their first shingle only."""
+    shingles = {substring for substring, _ in qualifying}
+    by_prefix = {}
+    for substring in shingles:
+        by_prefix.setdefault(substring[:-1], []).append(substring)
+    stitched = {}
+    for substring in shingles:
+        overlap = len(substring) - 1
+        merged, count = substring, 0
+        while True:
+            for nxt in by_prefix.get(merged[-overlap:], []):
+                candidate = merged + nxt[-1]
+                candidate_count = sum(1 for v in values if candidate in v)
+                if candidate_count > threshold:
+                    merged, count = candidate, candidate_count
+                    break
+            else:
+                break
+        if merged != substring:
+            stitched[merged] = count
+    return stitched
+
+
+class RepetitivePatternTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def analyze(self, path, headers):
+        """Warnings logged by the analysis and the seconds it took."""
+        with self.assertLogs("src.pipeline.normalizer", "WARNING") as logs:
+            started = time.perf_counter()
+            Normalizer(GEMINI_RESULT)._analyze_repetitive_patterns(path, headers)
+            elapsed = time.perf_counter() - started
+        return logs.output, elapsed
+
+    def test_longest_patterns_match_legacy_stitching(self):
+        rng = random.Random(11)
+        rows = ["email,customer,note"]
+        for i in range(3000):
+            domain = "examplemail-service.com" if rng.random() < 0.8 else f"d{rng.randint(0, 99)}.org"
+            note = "Imported from the legacy customer portal" if rng.random() < 0.7 else f"n{i}"
+            rows.append(f"user.{rng.randint(0, 10 ** 6)}@{domain},CUST-2024-{i:05d}-NL,{note}")
+        path = self.tmp / "patterns.csv"
+        path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+        headers = ["email", "customer", "note"]
+        output, elapsed = self.analyze(path, headers)
+        with mock.patch.object(Normalizer, "_stitch_shingles",
+                               lambda self, qualifying, counts, values, threshold:
+                               legacy_stitch_shingles(qualifying, values, threshold)):
+            legacy_output, legacy_elapsed = self.analyze(path, headers)
+        self.assertEqual(sorted(output), sorted(legacy_output))
+        self.assertTrue(any("'@examplemail-service.com'" in line for line in output), output)
+        self.assertTrue(any("'Imported from the legacy customer portal'" in line for line in output), output)
+        self.assertLess(elapsed, legacy_elapsed)
+
+
+if __name__ == "__main__":
+    unittest.main()
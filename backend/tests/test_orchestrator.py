@@ -0,0 +1,126 @@
+"""
+Tests for the pipeline orchestrator.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("GEMINI_API_KEY", "test")  # settings require a key; the tests never call Gemini
+
+from src.config.settings import settings
+from src.models.pipeline_run import PipelineRun, init_db
+from src.pipeline.orchestrator import PipelineOrchestrator
+
+# Headers from known_headers.json, so the mapping is automatic and Gemini is never queried
+KNOWN_HEADER = "digid_email,pdata_pdata_fullname,location_country\n"
+
+
+def known_csv(path, rows):
+    path.write_text(KNOWN_HEADER + "".join(f"u{i}@x.com,Bob {i},ES\n" for i in range(rows)), encoding="utf-8")
+    return path
+
+
+class OrchestratorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        dirs = {name: str(self.tmp / name.lower()) for name in
+                ("INPUT_DIR", "OUTPUT_DIR", "INVALID_DIR", "REPROCESS_DIR", "NOT_TABULAR_DIR", "BE_OUTPUT_DIR", "LOGS_DIR")}
+        for path in dirs.values():
+            os.makedirs(path)
+        patcher = mock.patch.multiple(settings, **dirs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # process_file replaces the root handlers with its own; put the test runner's back afterwards
+        root_logger = logging.getLogger()
+        self.addCleanup(setattr, root_logger, "handlers", list(root_logger.handlers))
+        self.addCleanup(root_logger.setLevel, root_logger.level)
+        # A file database: init_db sets pool options that an in-memory SQLite engine does not accept
+        self.session_factory = init_db(f"sqlite:///{self.tmp / 'runs.db'}")
+        self.addCleanup(self.session_factory.kw["bind"].dispose)
+        self.orchestrator = PipelineOrchestrator(self.session_factory)
+
+    def load_run(self, run_id):
+        with self.session_factory() as db_session:
+            run = db_session.get(PipelineRun, run_id)
+            db_session.expunge(run)
+        return run
+
+    def stage_statuses(self, run):
+        return {stage: stats["status"] for stage, stats in json.loads(run.stage_stats).items()}
+
+
+class ProcessFileTest(OrchestratorTestCase):
+    def test_known_headers_are_normalized_without_gemini(self):
+        input_path = known_csv(Path(settings.INPUT_DIR) / "people.csv", 30)
+        run = self.load_run(self.orchestrator.process_file(input_path))
+        self.assertEqual(run.status, "ok")
+        self.assertEqual(run.final_row_count, 31)  # header line included
+        self.assertEqual(self.stage_statuses(run), {"classification": "ok", "sampling": "skipped",
+                                                    "gemini_query": "skipped", "normalization": "ok"})
+        output = Path(settings.OUTPUT_DIR) / "normalized_people.csv"
+        self.assertEqual(len(output.read_text(encoding="utf-8").splitlines()), 31)
+        self.assertTrue(Path(run.log_file_path).exists())
+
+    def test_failed_stage_marks_the_run_as_failed(self):
+        input_path = Path(settings.INPUT_DIR) / "unknown.csv"
+        input_path.write_text("aaa,bbb,ccc\n" + "".join(f"{i},{i * 2},q\n" for i in range(20)), encoding="utf-8")
+        with mock.patch.object(PipelineOrchestrator, "_run_gemini_query", side_effect=RuntimeError("Gemini unavailable")):
+            run = self.load_run(self.orchestrator.process_file(input_path))
+        self.assertEqual(run.status, "error")
+        self.assertIn("Gemini unavailable", run.error_message)
+        statuses = self.stage_statuses(run)
+        self.assertEqual((statuses["classification"], statuses["sampling"]), ("ok", "ok"))
+        self.assertNotIn("normalization", statuses)
+        self.assertEqual(os.listdir(settings.OUTPUT_DIR), [])
+
+
+class RunPipelineTest(OrchestratorTestCase):
+    def test_failure_mid_stage_drains_the_pipeline(self):
+        files = [known_csv(Path(settings.INPUT_DIR) / f"in{i}.csv", 10 + i) for i in range(4)]
+        normalize = PipelineOrchestrator._run_normalization
+
+        def fail_second_file(orchestrator, run, file_path, mapping, db_session):
+            if file_path.name == "in1.csv":
+                raise RuntimeError("disk full")
+            return normalize(orchestrator, run, file_path, mapping, db_session)
+
+        root_logger = logging.getLogger()
+        handlers = list(root_logger.handlers)
+        # Recording the failure fails as well, so nothing but the stage worker can drop the file
+        with mock.patch.object(PipelineOrchestrator, "_run_normalization", fail_second_file), \
+                mock.patch.object(PipelineOrchestrator, "_fail_run", side_effect=RuntimeError("database is locked")):
+            run_ids = asyncio.run(asyncio.wait_for(self.orchestrator.run_pipeline(files, queue_size=1), timeout=60))
+        self.assertEqual(len(run_ids), 4)
+        self.assertEqual(root_logger.handlers, handlers)
+        runs = {run.filename: run for run in map(self.load_run, run_ids)}
+        self.assertEqual({name: run.status for name, run in runs.items()},
+                         {"in0.csv": "ok", "in1.csv": "running", "in2.csv": "ok", "in3.csv": "ok"})
+        self.assertEqual(runs["in3.csv"].final_row_count, 14)
+
+
+class ProcessFilesTest(OrchestratorTestCase):
+    def test_workers_record_runs_in_the_given_database(self):
+        files = [known_csv(Path(settings.INPUT_DIR) / f"p{i}.csv", 10 * (i + 1)) for i in range(3)]
+        # Removed before the batch starts: sorted last, reported as a failed run by its worker
+        files.append(Path(settings.INPUT_DIR) / "gone.csv")
+        # Spawned workers build their settings from the environment, not from the patched object
+        dirs = {name: getattr(settings, name) for name in
+                ("OUTPUT_DIR", "INVALID_DIR", "REPROCESS_DIR", "NOT_TABULAR_DIR", "BE_OUTPUT_DIR", "LOGS_DIR")}
+        with mock.patch.dict(os.environ, dirs):
+            run_ids = self.orchestrator.process_files(files, workers=2, db_url=f"sqlite:///{self.tmp / 'runs.db'}")
+        runs = {run.filename: run for run in map(self.load_run, run_ids)}
+        self.assertEqual({name: (run.status, run.final_row_count) for name, run in runs.items()},
+                         {"p0.csv": ("ok", 11), "p1.csv": ("ok", 21), "p2.csv": ("ok", 31), "gone.csv": ("error", None)})
+
+
+if __name__ == "__main__":
+    unittest.main()
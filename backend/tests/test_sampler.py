@@ -0,0 +1,49 @@
+"""
+Tests for the sample extractor.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("GEMINI_API_KEY", "test")  # settings require a key; the tests never call Gemini
+
+from src.pipeline.sampler import extract_sample
+
+
+class ExtractSampleTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def sample(self, data):
+        path = self.tmp / "sample.csv"
+        path.write_bytes(data)
+        rows, error, warnings = extract_sample(path, encoding="utf-8")
+        self.assertEqual((error, warnings), ("", []))
+        return rows
+
+    def test_blank_lines_are_left_out_of_the_sample(self):
+        data = (b"\nemail,name\r\n\r\na@x.com,A\n\n\n  \nb@x.com,\"B\n\nsecond\"\n"
+                b",\nc@x.com,C\n\n")
+        self.assertEqual(self.sample(data), [
+            ["email", "name"],
+            ["a@x.com", "A"],
+            ["  "],  # whitespace is not a blank line
+            ["b@x.com", "B\n\nsecond"],  # blank lines inside a quoted field are part of it
+            ["", ""],
+            ["c@x.com", "C"],
+        ])
+
+    def test_blank_lines_do_not_count_toward_the_row_limit(self):
+        data = b"email\n" + b"".join(f"u{i}@x.com\n\n".encode() for i in range(1200))
+        rows = self.sample(data)
+        self.assertEqual(len(rows), 1000)
+        self.assertEqual(rows[-1], ["u998@x.com"])
+
+
+if __name__ == "__main__":
+    unittest.main()
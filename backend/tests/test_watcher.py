@@ -0,0 +1,101 @@
+"""
+Tests for archive extraction in the file watcher.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("GEMINI_API_KEY", "test")  # settings require a key; the tests never call Gemini
+
+from src.pipeline import watcher
+
+
+def member_data(name):
+    return f"email,name\n{name}@example.com,{name}\n".encode() * 50
+
+
+class ExtractZipTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def extract(self, archive):
+        extract_dir = self.tmp / f"out_{len(list(self.tmp.iterdir()))}"
+        extract_dir.mkdir()
+        landed = []
+        files = watcher.extract_archive_recursive(archive, extract_dir, on_file=landed.append)
+        return extract_dir, files, landed
+
+    def test_nested_dirs_all_members_extracted(self):
+        # Members share parent directories that do not exist yet, created by concurrent workers
+        names = [f"d{i % 7}/s{i % 5}/f{i}.csv" for i in range(400)]
+        archive = self.tmp / "nested.zip"
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name in names:
+                zf.writestr(name, member_data(name))
+        with mock.patch.object(watcher, "EXTRACT_WORKERS", 8):
+            for _ in range(5):
+                extract_dir, files, landed = self.extract(archive)
+                self.assertEqual(sorted(files), sorted(extract_dir / name for name in names))
+                self.assertEqual(sorted(landed), sorted(files))
+                for name in names:
+                    self.assertEqual((extract_dir / name).read_bytes(), member_data(name))
+
+    def test_corrupt_member_keeps_the_others(self):
+        names = [f"dir/f{i}.csv" for i in range(20)]
+        archive = self.tmp / "corrupt.zip"
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+            for name in names:
+                zf.writestr(name, member_data(name))
+        # Flip a byte inside the stored data of one member so its CRC check fails
+        with zipfile.ZipFile(archive) as zf:
+            info = zf.getinfo("dir/f7.csv")
+        raw = bytearray(archive.read_bytes())
+        data_at = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+        raw[data_at + 5] ^= 0xFF
+        archive.write_bytes(bytes(raw))
+        with mock.patch.object(watcher, "EXTRACT_WORKERS", 4):
+            extract_dir, files, landed = self.extract(archive)
+        expected = [extract_dir / name for name in names if name != "dir/f7.csv"]
+        self.assertEqual(sorted(files), sorted(expected))
+        self.assertEqual(sorted(landed), sorted(expected))
+
+
+class EventQueueTest(unittest.TestCase):
+    def test_events_for_a_path_in_process_are_dropped(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        class Handler(watcher.CSVHandler):
+            def process_file(self, file_path):
+                calls.append(file_path)
+                started.set()
+                release.wait(5)
+
+        handler = Handler(orchestrator=None)
+        self.addCleanup(handler.close)
+        self.addCleanup(release.set)
+        path = Path("inbound/a.csv")
+        handler.submit(path)
+        self.assertTrue(started.wait(5))
+        # A worker is processing the path: further events must not start a second run
+        for _ in range(3):
+            handler.submit(path)
+        time.sleep(watcher.EVENT_DEBOUNCE * 3)
+        self.assertEqual(calls, [path])
+        release.set()
+        handler.close()
+        self.assertEqual(calls, [path])
+
+
+if __name__ == "__main__":
+    unittest.main()
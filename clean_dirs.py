@@ -21,6 +21,7 @@ python clean_dirs.py --logs --data inbound output
 python clean_dirs.py --keep-db
 """
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import os
 import shutil
 import sys
@@ -41,25 +42,23 @@ else:
     LOGS_DIR = Path('backend/logs')
     DB_FILE = Path('backend/pipeline.db')
 
-try:
-    from models.pipeline_run import init_db
-    DB_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Could not import database models: {e}")
-    print(f"Python path: {sys.path}")
-    DB_AVAILABLE = False
-
-DATA_SUBDIRS = [d.name for d in DATA_DIR.iterdir() if d.is_dir()] if DATA_DIR.exists() else []
+def empty_dir(path: Path):
+    """
+    Delete everything inside path but not path itself, so a symlinked or mounted directory keeps
+    working and keeps its mode and owner. Each subdirectory goes in one rmtree call.
+    """
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
 
 def clean_dir(path: Path):
     if not path.exists():
         print(f"Directory {path} does not exist.")
         return
-    for item in path.iterdir():
-        if item.is_file():
-            item.unlink()
-        elif item.is_dir():
-            shutil.rmtree(item)
+    empty_dir(path)
     print(f"Cleaned {path}")
 
 def clean_data(subdirs=None):
@@ -67,18 +66,27 @@ def clean_data(subdirs=None):
         print(f"Data directory {DATA_DIR} does not exist.")
         return
     if subdirs is None:
-        subdirs = DATA_SUBDIRS
+        # Listed here rather than at import, so runs that skip the data cleanup don't pay for it
+        with os.scandir(DATA_DIR) as it:
+            subdirs = [entry.name for entry in it if entry.is_dir()]
+    targets = []
     for sub in subdirs:
         sub_path = DATA_DIR / sub
-        if sub_path.exists() and sub_path.is_dir():
-            for item in sub_path.iterdir():
-                if item.is_file():
-                    item.unlink()
-                elif item.is_dir():
-                    shutil.rmtree(item)
-            print(f"Cleaned {sub_path}")
+        if sub_path.is_dir():
+            targets.append(sub_path)
         else:
             print(f"Subdirectory {sub_path} does not exist.")
+    if not targets:
+        return
+    # Removal is bound by unlink latency, so the subdirectories are emptied concurrently
+    with ThreadPoolExecutor(max_workers=min(8, len(targets))) as executor:
+        futures = {sub_path: executor.submit(empty_dir, sub_path) for sub_path in targets}
+    for sub_path, future in futures.items():
+        try:
+            future.result()
+            print(f"Cleaned {sub_path}")
+        except OSError as e:
+            print(f"Error cleaning {sub_path}: {e}")
 
 def clean_logs():
     clean_dir(LOGS_DIR)
@@ -90,7 +98,12 @@ def clean_database():
         DB_FILE.unlink()
         print(f"Deleted existing database {DB_FILE}")
     
-    if not DB_AVAILABLE:
+    # Imported here so runs that keep the database don't load SQLAlchemy
+    try:
+        from models.pipeline_run import init_db
+    except ImportError as e:
+        print(f"Warning: Could not import database models: {e}")
+        print(f"Python path: {sys.path}")
         print("Database models not available, cannot recreate database")
         return
     